@@ -0,0 +1,75 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.26;
+
+import "./interfaces/IERC20.sol";
+
+
+/**
+ * @dev Merkle-tree airdrop of RUX (or any ERC20 token).
+ *
+ * Instead of one `transfer` per recipient, the distributor is funded once and recipients claim
+ * their share by presenting a Merkle proof against `merkleRoot` (built by `scripts/airdrop.py`).
+ *
+ * Leaves are `keccak256(abi.encodePacked(index, account, amount))`, internal nodes are
+ * `keccak256(abi.encodePacked(left, right))`, and a missing right sibling (odd number of nodes
+ * in a level) is `bytes32(0)`. The bits of `index` give the position of each node in its pair.
+ */
+contract RUAirdrop {
+
+    event Claimed(uint index, address account, uint amount);
+
+    /**
+     * The token being distributed.
+     */
+    IERC20 public immutable token;
+
+    /**
+     * Root of the Merkle tree of (index, account, amount) leaves.
+     */
+    bytes32 public immutable merkleRoot;
+
+    /**
+     * One bit per leaf index, set once the leaf has been claimed.
+     */
+    mapping(uint => uint) private claimedBitmap;
+
+
+    constructor(IERC20 _token, bytes32 _merkleRoot) {
+        token = _token;
+        merkleRoot = _merkleRoot;
+    }
+
+    /**
+     * @dev Returns true if the leaf at `index` has already been claimed.
+     */
+    function isClaimed(uint index) public view returns (bool) {
+        return claimedBitmap[index / 256] & (1 << (index % 256)) != 0;
+    }
+
+    /**
+     * @dev Transfers `amount` tokens to `account` if (`index`, `account`, `amount`) is a leaf of the tree
+     * and hasn't been claimed yet. Anyone can submit the claim; the tokens always go to `account`.
+     *
+     * Emits a {Claimed} event.
+     */
+    function claim(uint index, address account, uint amount, bytes32[] calldata proof) external {
+        require(!isClaimed(index), "Already claimed");
+
+        bytes32 node = keccak256(abi.encodePacked(index, account, amount));
+        uint path = index;
+        for (uint i = 0; i < proof.length; ++i) {
+            if (path & 1 == 0) {
+                node = keccak256(abi.encodePacked(node, proof[i]));
+            } else {
+                node = keccak256(abi.encodePacked(proof[i], node));
+            }
+            path >>= 1;
+        }
+        require(path == 0 && node == merkleRoot, "Invalid proof");
+
+        claimedBitmap[index / 256] |= 1 << (index % 256);
+        require(token.transfer(account, amount), "Transfer failed");
+
+        emit Claimed(index, account, amount);
+    }
+}
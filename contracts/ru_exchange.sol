@@ -9,8 +9,37 @@ contract RUExchange is IExchange {
         return false;
     }
 
+    /**
+     * Time-weighted price accumulator: the sum over time of the price of a token in ETH, as a
+     * UQ112x112 fixed-point number, times the seconds it held. Packed with the timestamp of the
+     * last update into a single storage slot. The accumulator is meant to overflow; readers take
+     * differences modulo 2**224 (see `scripts/twap.py`).
+     */
+    uint224 private priceCumulativeLast;
+    uint32 private blockTimestampLast;
+
+    /**
+     * Set once the exchange is constructed, by its constructor or (for EIP-1167 clones created by
+     * `RUFactory`, which never run the constructor) by `initializeClone`.
+     */
+    bool private constructed;
+
     constructor() {
-        // TODO: implement
+        _construct(msg.sender);
+    }
+
+    /**
+     * @dev Initializer replacing the constructor for clones; `deployer` stands for the `msg.sender`
+     * of the constructor. Can only be called once, and never on an exchange created with the constructor.
+     */
+    function initializeClone(address deployer) external {
+        _construct(deployer);
+    }
+
+    function _construct(address deployer) internal {
+        require(!constructed, "Already constructed");
+        constructed = true;
+        // TODO: implement (the constructor's logic goes here, with `deployer` as its sender)
     }
 
     function getToken() override external view returns(IERC20) {
@@ -19,6 +48,7 @@ contract RUExchange is IExchange {
 
 
     function initialize(IERC20 _RUXtoken, uint8 _feePercent, uint initialTOK, uint initialETH) override public payable returns(uint) {
+        _accumulatePrice(0, 0);
         // TODO: implement
     }
 
@@ -31,6 +61,7 @@ contract RUExchange is IExchange {
      * @return Returns the actual total cost in ETH including fee.
      */
     function buyTokens(uint amount, uint maxPrice) override public payable returns (uint,uint,uint) {
+        _updatePriceCumulative(msg.value);
         // TODO: implement
     }
 
@@ -42,16 +73,54 @@ contract RUExchange is IExchange {
      * @return Returns a tuple with the actual total value in ETH minus the fee, the eth fee and the token fee.
      */
     function sellTokens(uint amount, uint minPrice) override public returns (uint, uint, uint) {
+        _updatePriceCumulative(0);
         // TODO: implement
     }
 
     /**
      * Returns the current number of tokens in the liquidity pool.
      */
-    function tokenBalance() external view returns(uint) {
+    function tokenBalance() public view returns(uint) {
         // TODO: implement
     }
 
+    /**
+     * @dev Returns the price accumulator and the block timestamp of its last update.
+     * The time-weighted average price of a token in ETH between two observations is
+     * (cumulative1 - cumulative0) / (timestamp1 - timestamp0) / 2**112, with both differences
+     * taken modulo the type's range.
+     */
+    function getPriceCumulative() external view returns (uint224, uint32) {
+        return (priceCumulativeLast, blockTimestampLast);
+    }
+
+    /**
+     * @dev Accumulate the price for the time elapsed since the last update. Must be called at the start
+     * of each function that changes the reserves, while they are still as they were before the change;
+     * `ethReceived` is the ETH sent with the call, which is already in the balance.
+     *
+     * Costs one `tokenBalance()` call and the read and write of the accumulator slot, on top of the swap
+     * itself; `ape run twap` measures it against `RUExchangeWithoutTWAP`, which overrides this with a no-op.
+     */
+    function _updatePriceCumulative(uint ethReceived) internal virtual {
+        _accumulatePrice(tokenBalance(), address(this).balance - ethReceived);
+    }
+
+    /**
+     * @dev Accumulate the price given by the reserves `tokReserve` and `ethReserve` for the time elapsed
+     * since the last update.
+     */
+    function _accumulatePrice(uint tokReserve, uint ethReserve) internal {
+        uint32 blockTimestamp = uint32(block.timestamp);
+        unchecked {
+            uint32 elapsed = blockTimestamp - blockTimestampLast;
+            if (elapsed > 0 && tokReserve > 0) {
+                priceCumulativeLast += uint224((ethReserve << 112) / tokReserve) * elapsed;
+            }
+        }
+        blockTimestampLast = blockTimestamp;
+    }
+
     
     /**
      * @dev mint `amount` liquidity tokens, as long as the total number of tokens spent is at most `maxTOK`
@@ -61,6 +130,7 @@ contract RUExchange is IExchange {
      * @return returns a tuple consisting of (token_spent, eth_spent). 
      */
     function mintLiquidityTokens(uint amount, uint maxTOK, uint maxETH) public payable returns (uint,uint) {
+        _updatePriceCumulative(msg.value);
         // TODO: implement
     }
 
@@ -70,6 +140,7 @@ contract RUExchange is IExchange {
      * @return Returns a tuple consisting of (token_credited, eth_credited). 
      */
     function burnLiquidityTokens(uint amount, uint minTOK, uint minETH) override public payable returns (uint,uint) {
+        _updatePriceCumulative(msg.value);
         // TODO: implement
     }
     
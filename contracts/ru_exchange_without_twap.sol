@@ -0,0 +1,15 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.26;
+
+import "./ru_exchange.sol";
+
+
+/**
+ * @dev RUExchange without the price accumulator, to measure its gas overhead (see `scripts/twap.py`).
+ * Not meant to be deployed for anything else: its `getPriceCumulative` only ever reflects `initialize`.
+ */
+contract RUExchangeWithoutTWAP is RUExchange {
+
+    function _updatePriceCumulative(uint) internal override {
+    }
+}
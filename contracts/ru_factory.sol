@@ -0,0 +1,108 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.26;
+
+import "./ru_token.sol";
+import "./ru_exchange.sol";
+
+
+/**
+ * @dev Factory of RUToken and RUExchange instances as EIP-1167 minimal proxies.
+ *
+ * Every instance is a 45-byte proxy that delegates all calls to a single implementation contract,
+ * so creating one costs a fraction of deploying the full bytecode. Proxies don't run constructors:
+ * the factory calls their `initializeClone` in the same transaction, so no one else can initialize them.
+ *
+ * Instances are created with CREATE2, with the salt `keccak256(abi.encode(msg.sender, salt))`, so their
+ * addresses can be predicted off-chain (see `scripts/factory.py`) and can't be taken by another sender.
+ */
+contract RUFactory {
+
+    event TokenCreated(address token, uint tokenPrice, uint maxTokens);
+    event ExchangeCreated(address exchange, address deployer);
+
+    /**
+     * The contracts all tokens and all exchanges delegate to.
+     */
+    address public immutable tokenImplementation;
+    address public immutable exchangeImplementation;
+
+
+    constructor(address _tokenImplementation, address _exchangeImplementation) {
+        tokenImplementation = _tokenImplementation;
+        exchangeImplementation = _exchangeImplementation;
+    }
+
+    /**
+     * @dev Creates a token with the given constructor arguments.
+     *
+     * Emits a {TokenCreated} event.
+     */
+    function createToken(uint _tokenPrice, uint _maxTokens, bytes32 salt) public returns (address token) {
+        token = _clone(tokenImplementation, salt);
+        RUToken(token).initializeClone(_tokenPrice, _maxTokens);
+        emit TokenCreated(token, _tokenPrice, _maxTokens);
+    }
+
+    /**
+     * @dev Creates one token per entry of the (equal-length) arrays.
+     */
+    function createTokens(uint[] calldata tokenPrices, uint[] calldata maxTokens, bytes32[] calldata salts)
+            external returns (address[] memory tokens) {
+        require(tokenPrices.length == maxTokens.length && tokenPrices.length == salts.length, "Length mismatch");
+        tokens = new address[](salts.length);
+        for (uint i = 0; i < salts.length; ++i) {
+            tokens[i] = createToken(tokenPrices[i], maxTokens[i], salts[i]);
+        }
+    }
+
+    /**
+     * @dev Creates an exchange, constructed as if the caller had deployed it.
+     *
+     * Emits an {ExchangeCreated} event.
+     */
+    function createExchange(bytes32 salt) public returns (address exchange) {
+        exchange = _clone(exchangeImplementation, salt);
+        RUExchange(exchange).initializeClone(msg.sender);
+        emit ExchangeCreated(exchange, msg.sender);
+    }
+
+    /**
+     * @dev Creates one exchange per salt.
+     */
+    function createExchanges(bytes32[] calldata salts) external returns (address[] memory exchanges) {
+        exchanges = new address[](salts.length);
+        for (uint i = 0; i < salts.length; ++i) {
+            exchanges[i] = createExchange(salts[i]);
+        }
+    }
+
+    /**
+     * @dev Returns the address of the clone of `implementation` that `sender` would create with `salt`.
+     */
+    function predictAddress(address implementation, address sender, bytes32 salt) external view returns (address) {
+        bytes32 codeHash = keccak256(_proxyCode(implementation));
+        bytes32 hash = keccak256(abi.encodePacked(bytes1(0xff), address(this), _salt(sender, salt), codeHash));
+        return address(uint160(uint(hash)));
+    }
+
+    function _salt(address sender, bytes32 salt) internal pure returns (bytes32) {
+        return keccak256(abi.encode(sender, salt));
+    }
+
+    /**
+     * @dev Creation code of an EIP-1167 proxy to `implementation`.
+     */
+    function _proxyCode(address implementation) internal pure returns (bytes memory) {
+        return abi.encodePacked(
+            hex"3d602d80600a3d3981f3363d3d373d3d3d363d73", implementation, hex"5af43d82803e903d91602b57fd5bf3");
+    }
+
+    function _clone(address implementation, bytes32 salt) internal returns (address instance) {
+        bytes memory code = _proxyCode(implementation);
+        bytes32 fullSalt = _salt(msg.sender, salt);
+        assembly {
+            instance := create2(0, add(code, 0x20), mload(code), fullSalt)
+        }
+        require(instance != address(0), "Create2 failed");
+    }
+}
@@ -37,8 +37,28 @@ contract RUToken is IERC20, IERC20Metadata {
      */
     uint public tokenPrice;
 
+    /**
+     * Set once the token is initialized, by its constructor or (for EIP-1167 clones
+     * created by `RUFactory`, which never run the constructor) by `initializeClone`.
+     */
+    bool private initialized;
+
 
     constructor(uint _tokenPrice, uint _maxTokens) {
+        _initialize(_tokenPrice, _maxTokens);
+    }
+
+    /**
+     * @dev Initializer replacing the constructor for clones. Can only be called once, and never
+     * on a token created with the constructor (such as the implementation the clones delegate to).
+     */
+    function initializeClone(uint _tokenPrice, uint _maxTokens) external {
+        _initialize(_tokenPrice, _maxTokens);
+    }
+
+    function _initialize(uint _tokenPrice, uint _maxTokens) internal {
+        require(!initialized, "Already initialized");
+        initialized = true;
         tokenPrice = _tokenPrice;
         maxTokens = _maxTokens;
     }
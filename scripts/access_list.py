@@ -0,0 +1,198 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import json
+import os
+
+from eth_utils import is_address, to_checksum_address
+
+from scripts.checkpoint import save_json
+
+# EIP-2930 access lists for RUToken and RUExchange transactions.
+#
+# The first access to an account or storage slot in a transaction is "cold" and costs 2600 (account) or
+# 2100 (slot) gas, while an access list pre-declares them for 2400 and 1900 gas. The lists are generated
+# with `eth_createAccessList` (so this needs a provider that supports it, e.g. the anvil node from
+# docker-compose.yml), once per call shape: the slots touched by `transferFrom(a, b, x)` depend on the
+# addresses involved but not on the amount, so lists are cached per (contract, function, participants).
+#
+# An access list does not always pay off: the transaction's sender and receiver are warm anyway, so a list
+# that only declares slots of the called contract costs 2400 gas for its address up front. Every list is
+# therefore measured with `eth_estimateGas` when it is created, and only attached if it saves gas.
+#
+#     cache = AccessListCache.load('access_lists.json')
+#     tok = with_access_lists(tok, cache)
+#     tok.transferFrom(a2, a3, 50, sender=a3)  # Sent with the cached access list, if it helps.
+#     cache.save('access_lists.json')
+#
+# `ape run access_list --network ethereum:local:foundry` reports the gas saved per operation.
+
+
+class Entry(NamedTuple):
+    access_list: List[dict]  # [{'address': ..., 'storageKeys': [...]}]
+    gas_without: int
+    gas_with: int
+
+    @property
+    def saved(self) -> int:
+        return self.gas_without - self.gas_with
+
+    @property
+    def useful(self) -> bool:
+        return bool(self.access_list) and self.saved > 0
+
+
+def _address_of(value) -> Optional[str]:
+    address = getattr(value, 'address', value)
+    if isinstance(address, str) and is_address(address):
+        return to_checksum_address(address)
+    return None
+
+
+# The call shape of a transaction: which function of which contract, sent by whom, with which addresses
+# as arguments. Other arguments (amounts, signatures) don't change the accounts and slots it touches.
+def call_key(contract_address: str, method: str, args: tuple, sender) -> Tuple[str, str, Tuple[str, ...]]:
+    participants = [_address_of(sender)] + [_address_of(arg) for arg in args]
+    return (to_checksum_address(contract_address), method, tuple(p or '' for p in participants))
+
+
+def _key_to_str(key: Tuple[str, str, Tuple[str, ...]]) -> str:
+    return '{}.{}({})'.format(key[0], key[1], ','.join(key[2]))
+
+
+def _normalize(access_list) -> List[dict]:
+    items = []
+    for item in access_list:
+        if not isinstance(item, dict):
+            item = item.model_dump(by_alias=True, mode='json')
+        keys = [key if isinstance(key, str) else '0x' + bytes(key).hex() for key in item['storageKeys']]
+        items.append({'address': to_checksum_address(item['address']), 'storageKeys': keys})
+    return items
+
+
+class AccessListCache:
+    def __init__(self) -> None:
+        self.entries: Dict[Tuple[str, str, Tuple[str, ...]], Entry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # The entry for calling `method` of `contract` with `args`, created on the first call of that shape.
+    def entry(self, contract, method: str, *args, **kwargs) -> Entry:
+        key = call_key(contract.address, method, args, kwargs.get('sender'))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self.entries[key] = self.create(contract, method, *args, **kwargs)
+        return entry
+
+    def create(self, contract, method: str, *args, **kwargs) -> Entry:
+        from ape import chain
+
+        handler = getattr(contract, method)
+        access_list = _normalize(chain.provider.create_access_list(handler.as_transaction(*args, **kwargs)))
+        gas_without = handler.estimate_gas_cost(*args, **kwargs)
+        gas_with = handler.estimate_gas_cost(*args, access_list=access_list, **kwargs) if access_list else gas_without
+        return Entry(access_list, gas_without, gas_with)
+
+    # Extra transaction kwargs for this call: the access list if it saves gas, otherwise nothing (an
+    # empty `access_list` would make ape generate one on every transaction).
+    def kwargs_for(self, contract, method: str, *args, **kwargs) -> dict:
+        entry = self.entry(contract, method, *args, **kwargs)
+        return {'access_list': entry.access_list} if entry.useful else {}
+
+    def send(self, contract, method: str, *args, **kwargs):
+        if 'access_list' not in kwargs:
+            kwargs.update(self.kwargs_for(contract, method, *args, **kwargs))
+        return getattr(contract, method)(*args, **kwargs)
+
+    # Write the cache to `path` atomically (see scripts/checkpoint.py).
+    def save(self, path: str) -> None:
+        state = {_key_to_str(key): {'key': [key[0], key[1], list(key[2])], 'access_list': entry.access_list,
+                                    'gas_without': entry.gas_without, 'gas_with': entry.gas_with}
+                 for key, entry in self.entries.items()}
+        save_json(path, state, indent=1)
+
+    # Load a cache written by `save`, or start empty if there is none. Lists depend on the contracts'
+    # code, so a cache should not be reused across redeployments at the same addresses with new code.
+    @classmethod
+    def load(cls, path: str) -> 'AccessListCache':
+        cache = cls()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            for value in state.values():
+                address, method, participants = value['key']
+                cache.entries[(address, method, tuple(participants))] = Entry(
+                    value['access_list'], value['gas_without'], value['gas_with'])
+        return cache
+
+
+class _AccessListTransaction:
+    def __init__(self, contract, method: str, cache: AccessListCache) -> None:
+        self.contract = contract
+        self.method = method
+        self.cache = cache
+        self.handler = getattr(contract, method)
+
+    def __call__(self, *args, **kwargs):
+        return self.cache.send(self.contract, self.method, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+
+class AccessListContract:
+    def __init__(self, contract, cache: AccessListCache) -> None:
+        self.contract = contract
+        self.cache = cache
+        self.handlers = {}
+
+    def __getattr__(self, name):
+        from ape.contracts.base import ContractTransactionHandler
+
+        handler = self.handlers.get(name)
+        if handler is None:
+            attr = getattr(self.contract, name)
+            if not isinstance(attr, ContractTransactionHandler):
+                return attr
+            handler = self.handlers[name] = _AccessListTransaction(self.contract, name, self.cache)
+        return handler
+
+
+# Wrap `contract` so that its transactions are sent with cached access lists.
+def with_access_lists(contract, cache: AccessListCache) -> AccessListContract:
+    return AccessListContract(contract, cache)
+
+
+# Measure the operations exercised by the test suite (see `scripts/workload.py`), returning (operation,
+# entry) pairs. Each operation is sent after it is measured, so that later operations see the state they expect.
+def measure_workload(accounts, cache: AccessListCache) -> List[Tuple[str, Entry]]:
+    from scripts.workload import run_workload
+
+    results = []
+
+    def measure(label, contract, method, *args, **kwargs):
+        results.append((label, cache.entry(contract, method, *args, **kwargs)))
+        return cache.send(contract, method, *args, **kwargs)
+
+    run_workload(accounts, measure)
+    return results
+
+
+def main():
+    from ape import accounts
+
+    cache = AccessListCache()
+    results = measure_workload(accounts.test_accounts, cache)
+    print('{:20} {:>8} {:>8} {:>8} {:>6}  {}'.format('operation', 'without', 'with', 'saved', 'slots', 'attached'))
+    for label, entry in results:
+        slots = sum(len(item['storageKeys']) for item in entry.access_list)
+        print('{:20} {:>8} {:>8} {:>8} {:>6}  {}'.format(
+            label, entry.gas_without, entry.gas_with, entry.saved, slots, 'yes' if entry.useful else 'no'))
+    path = os.environ.get('ACCESS_LIST_CACHE')
+    if path:
+        cache.save(path)
+        print('Cache written to {}'.format(path))
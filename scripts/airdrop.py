@@ -0,0 +1,251 @@
+from typing import Iterator, List, Optional, Tuple
+import argparse
+import csv
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+
+from eth_utils import keccak
+
+# Builder for the Merkle tree claimed against by `contracts/ru_airdrop.sol`.
+#
+# The builder streams a CSV of (address, amount) rows and keeps only fixed-size buffers in memory:
+# leaves and each level of the tree are written to temporary files, then copied into a single file
+# holding:
+#
+#   header  --- magic, root, leaf count, tree depth, number of hash-table slots.
+#   table   --- open-addressing hash table of uint32 slots (leaf index + 1, 0 = empty) keyed by
+#               address, for O(1) lookup of an address's leaf.
+#   records --- one fixed-size record per leaf: address (20 bytes) and amount (32 bytes).
+#   levels  --- every level of the tree below the root, leaves first, as consecutive 32-byte hashes.
+#
+# Each node is stored once, and proofs are read from the levels at lookup time (`depth` sibling
+# hashes, found by index): about 125 MB for a million leaves, where storing every proof took 700 MB.
+#
+#     python -m scripts.airdrop build recipients.csv airdrop.bin
+#     python -m scripts.airdrop bench 1000000
+
+MAGIC = b'RUXDROP3'
+HEADER = struct.Struct('<8s32sQBQ')
+HEADER_SIZE = 64
+SLOT = struct.Struct('<I')
+ZERO = bytes(32)
+
+
+def leaf_hash(index: int, account: bytes, amount: int) -> bytes:
+    return keccak(index.to_bytes(32, 'big') + account + amount.to_bytes(32, 'big'))
+
+
+def parse_address(address: str) -> bytes:
+    account = bytes.fromhex(address.strip().removeprefix('0x').removeprefix('0X'))
+    if len(account) != 20:
+        raise ValueError('invalid address {!r}'.format(address))
+    return account
+
+
+def read_csv(path: str) -> Iterator[Tuple[bytes, int]]:
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().lower() in ('address', 'account'):
+                continue  # Blank line or header
+            yield parse_address(row[0]), int(row[1])
+
+
+def verify(root: bytes, index: int, account: bytes, amount: int, proof: List[bytes]) -> bool:
+    node = leaf_hash(index, account, amount)
+    path = index
+    for sibling in proof:
+        node = keccak(node + sibling) if path & 1 == 0 else keccak(sibling + node)
+        path >>= 1
+    return path == 0 and node == root
+
+
+# Addresses are not uniformly distributed (vanity and leading-zero addresses share prefixes), so
+# slots come from their hash rather than from their bytes.
+def _slot_of(account: bytes, slots: int) -> int:
+    return int.from_bytes(keccak(account)[:8], 'little') & (slots - 1)
+
+
+# Hash each pair of nodes of the level in `src` into the next level, written to `dst`.
+# Returns the number of nodes in the new level.
+def _build_level(src: str, dst: str, count: int, chunk: int = 1 << 16) -> int:
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        remaining = count
+        while remaining > 0:
+            n = min(chunk, remaining)
+            data = fin.read(32 * n)
+            remaining -= n
+            if n % 2:
+                data += ZERO
+            fout.write(b''.join(keccak(data[i:i + 64]) for i in range(0, len(data), 64)))
+    return (count + 1) // 2
+
+
+# Number of nodes in each level of a tree over `count` leaves, from the leaves up to the root.
+def level_sizes(count: int) -> List[int]:
+    sizes = [count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def build(entries, out_path: str, workdir: Optional[str] = None) -> bytes:
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        # Pass 1: leaves and (address, amount) entries.
+        level_paths = [os.path.join(tmp, 'level0')]
+        entries_path = os.path.join(tmp, 'entries')
+        count = 0
+        with open(level_paths[0], 'wb') as leaves, open(entries_path, 'wb') as out:
+            for account, amount in entries:
+                leaves.write(leaf_hash(count, account, amount))
+                out.write(account + amount.to_bytes(32, 'big'))
+                count += 1
+        if count == 0:
+            raise ValueError('no airdrop entries')
+
+        # Pass 2: one file per level, up to the root. The chunk size is even, so pairs never straddle chunks.
+        sizes = [count]
+        while sizes[-1] > 1:
+            level_paths.append(os.path.join(tmp, 'level{}'.format(len(sizes))))
+            sizes.append(_build_level(level_paths[-2], level_paths[-1], sizes[-1]))
+        with open(level_paths[-1], 'rb') as f:
+            root = f.read(32)
+        depth = len(sizes) - 1
+
+        # Pass 3: header, records and levels, then the hash table over the records.
+        slots = 1 << max(1, (2 * count - 1).bit_length())
+        records_offset = HEADER_SIZE + SLOT.size * slots
+        with open(out_path, 'wb+') as f:
+            f.write(HEADER.pack(MAGIC, root, count, depth, slots).ljust(HEADER_SIZE, b'\0'))
+            f.truncate(records_offset)
+            f.seek(records_offset)
+            for path in [entries_path] + level_paths[:-1]:
+                with open(path, 'rb') as src:
+                    shutil.copyfileobj(src, f, 1 << 20)
+            f.flush()
+            out = mmap.mmap(f.fileno(), 0)
+            try:
+                for index in range(count):
+                    offset = records_offset + 52 * index
+                    account = out[offset:offset + 20]
+                    slot = _slot_of(account, slots)
+                    while True:
+                        pos = HEADER_SIZE + SLOT.size * slot
+                        occupant = SLOT.unpack_from(out, pos)[0]
+                        if occupant == 0:
+                            break
+                        other = records_offset + 52 * (occupant - 1)
+                        if out[other:other + 20] == account:
+                            raise ValueError('duplicate address 0x{}'.format(account.hex()))
+                        slot = (slot + 1) & (slots - 1)
+                    SLOT.pack_into(out, pos, index + 1)
+            finally:
+                out.close()
+    return root
+
+
+class ProofFile:
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.root, self.count, self.depth, self.slots = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not an airdrop proof file'.format(path))
+        self.records_offset = HEADER_SIZE + SLOT.size * self.slots
+        self.levels = []  # (offset, number of nodes) of each level below the root
+        offset = self.records_offset + 52 * self.count
+        for size in level_sizes(self.count)[:-1]:
+            self.levels.append((offset, size))
+            offset += 32 * size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        self.data.close()
+
+    # The sibling hashes from leaf `index` up to the root, bottom-up.
+    def proof(self, index: int) -> List[bytes]:
+        proof = []
+        for k, (offset, size) in enumerate(self.levels):
+            sibling = (index >> k) ^ 1
+            proof.append(self.data[offset + 32 * sibling:offset + 32 * sibling + 32] if sibling < size else ZERO)
+        return proof
+
+    # Returns (account, amount, proof) for a leaf index.
+    def record(self, index: int) -> Tuple[bytes, int, List[bytes]]:
+        offset = self.records_offset + 52 * index
+        record = self.data[offset:offset + 52]
+        return record[:20], int.from_bytes(record[20:52], 'big'), self.proof(index)
+
+    # Returns (index, amount, proof) for an address, or None if it isn't part of the airdrop.
+    def lookup(self, address) -> Optional[Tuple[int, int, List[bytes]]]:
+        account = parse_address(address) if isinstance(address, str) else bytes(address)
+        slot = _slot_of(account, self.slots)
+        while True:
+            occupant = SLOT.unpack_from(self.data, HEADER_SIZE + SLOT.size * slot)[0]
+            if occupant == 0:
+                return None
+            offset = self.records_offset + 52 * (occupant - 1)
+            if self.data[offset:offset + 20] == account:
+                return occupant - 1, int.from_bytes(self.data[offset + 20:offset + 52], 'big'), self.proof(occupant - 1)
+            slot = (slot + 1) & (self.slots - 1)
+
+    # Arguments for `RUAirdrop.claim`, or None if the address isn't part of the airdrop.
+    def claim_args(self, address) -> Optional[tuple]:
+        found = self.lookup(address)
+        if found is None:
+            return None
+        index, amount, proof = found
+        return (index, address, amount, proof)
+
+
+def benchmark(n: int = 1_000_000, workdir: Optional[str] = None, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        csv_path = os.path.join(tmp, 'airdrop.csv')
+        with open(csv_path, 'w') as f:
+            f.write('address,amount\n')
+            for _ in range(n):
+                f.write('0x{},{}\n'.format(rng.randbytes(20).hex(), rng.randrange(1, 10 ** 21)))
+
+        out_path = os.path.join(tmp, 'airdrop.bin')
+        start = time.perf_counter()
+        build(read_csv(csv_path), out_path, tmp)
+        elapsed = time.perf_counter() - start
+        print('built {} leaves in {:.1f}s ({:.1f} MB proof file)'.format(n, elapsed, os.path.getsize(out_path) / 1e6))
+
+        proofs = ProofFile(out_path)
+        samples = [proofs.record(rng.randrange(n))[0] for _ in range(10_000)]
+        start = time.perf_counter()
+        found = [proofs.lookup(account) for account in samples]
+        elapsed = time.perf_counter() - start
+        print('{:.1f}us per lookup'.format(elapsed / len(samples) * 1e6))
+        assert all(verify(proofs.root, index, account, amount, proof)
+                   for account, (index, amount, proof) in zip(samples[:100], found))
+        proofs.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and benchmark RUAirdrop Merkle trees.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='Build a proof file from a CSV of address,amount rows.')
+    build_parser.add_argument('csv')
+    build_parser.add_argument('output')
+    bench_parser = commands.add_parser('bench', help='Build a tree of random leaves and time it.')
+    bench_parser.add_argument('leaves', type=int, nargs='?', default=1_000_000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        root = build(read_csv(args.csv), args.output, os.path.dirname(os.path.abspath(args.output)))
+        print('0x' + root.hex())
+    else:
+        benchmark(args.leaves)
+
+
+if __name__ == '__main__':
+    main()
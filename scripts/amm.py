@@ -0,0 +1,62 @@
+from typing import Tuple
+
+# Exact integer model of the RUExchange swap and liquidity rules described in the README.
+# All functions take the pool reserves (`tok`, `eth`) and return the amounts that change hands;
+# they never touch the chain, so they can be used to quote trades before sending them.
+
+
+def ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def fee_of(amount: int, fee_percent: int) -> int:
+    # Fees are always rounded up, in favor of the pool.
+    return ceil_div(amount * fee_percent, 100)
+
+
+# Buying `amount` tokens: the ETH fee is taken from the payment *before* the trade and
+# the token fee from the bought tokens *after* it.
+# Returns (actualPayment, actualEthFee, actualTokenFee), matching the `FeeDetails` event.
+def buy_quote(amount: int, tok: int, eth: int, fee_percent: int) -> Tuple[int, int, int]:
+    if not 0 < amount < tok:
+        raise ValueError("cannot buy {} tokens from a pool of {}".format(amount, tok))
+    traded_eth = ceil_div(eth * amount, tok - amount)  # ETH that keeps tok*eth constant
+    payment = ceil_div(traded_eth * 100, 100 - fee_percent)
+    return (payment, fee_of(payment, fee_percent), fee_of(amount, fee_percent))
+
+
+# Selling `amount` tokens: the token fee is taken *before* the trade and the ETH fee
+# from the proceeds *after* it.
+# Returns (actualPayment, actualEthFee, actualTokenFee), matching the `FeeDetails` event.
+def sell_quote(amount: int, tok: int, eth: int, fee_percent: int) -> Tuple[int, int, int]:
+    if amount <= 0:
+        raise ValueError("cannot sell {} tokens".format(amount))
+    token_fee = fee_of(amount, fee_percent)
+    traded_tok = amount - token_fee
+    proceeds = eth * traded_tok // (tok + traded_tok)
+    eth_fee = fee_of(proceeds, fee_percent)
+    return (proceeds - eth_fee, eth_fee, token_fee)
+
+
+# Returns the (tok, eth) reserves after a buy described by `buy_quote`.
+def reserves_after_buy(amount: int, tok: int, eth: int, quote: Tuple[int, int, int]) -> Tuple[int, int]:
+    payment, _, token_fee = quote
+    return (tok - amount + token_fee, eth + payment)
+
+
+# Returns the (tok, eth) reserves after a sale described by `sell_quote`.
+def reserves_after_sell(amount: int, tok: int, eth: int, quote: Tuple[int, int, int]) -> Tuple[int, int]:
+    payment, _, _ = quote
+    return (tok + amount, eth - payment)
+
+
+# Minting `lqt` liquidity tokens out of a supply of `supply` costs the same fraction of both reserves,
+# rounded up. Returns (numTOK, numETH), matching the `MintBurnDetails` event.
+def mint_quote(lqt: int, supply: int, tok: int, eth: int) -> Tuple[int, int]:
+    return (ceil_div(tok * lqt, supply), ceil_div(eth * lqt, supply))
+
+
+# Burning `lqt` liquidity tokens returns the same fraction of both reserves, rounded down.
+# Returns (numTOK, numETH), matching the `MintBurnDetails` event.
+def burn_quote(lqt: int, supply: int, tok: int, eth: int) -> Tuple[int, int]:
+    return (tok * lqt // supply, eth * lqt // supply)
@@ -0,0 +1,199 @@
+from typing import Dict, Iterable, Optional
+import time
+
+import numpy as np
+
+# Backtesting of RUExchange fee and initial-liquidity parameters.
+#
+# A trade stream is replayed against many candidate configurations at once. The state of every
+# configuration (reserves, liquidity-token supply, accumulated fees...) is kept in NumPy arrays with
+# one entry per configuration, so each trade costs a handful of vector operations regardless of how
+# many configurations are simulated. The swap rules mirror `scripts/amm.py` (which is exact), but in
+# floating point: amounts are off by at most the rounding of a few ULPs.
+
+BUY, SELL, MINT, BURN = 0, 1, 2, 3
+
+# A trade stream is a structured array with one record per operation:
+#  * `kind`   --- one of BUY, SELL, MINT, BURN.
+#  * `amount` --- tokens bought or sold, or for MINT/BURN the fraction of the current liquidity-token
+#                 supply that is minted or burned (so the same stream can be replayed against pools of
+#                 any size).
+#  * `limit`  --- the `maxPrice` of a buy or `minPrice` of a sale; 0 means no limit.
+TRADE_DTYPE = np.dtype([('kind', np.uint8), ('amount', np.float64), ('limit', np.float64)])
+
+
+class Configs:
+    def __init__(self, fee_percent, initial_tok, initial_eth) -> None:
+        fee_percent, initial_tok, initial_eth = np.broadcast_arrays(
+            np.asarray(fee_percent, dtype=np.float64),
+            np.asarray(initial_tok, dtype=np.float64),
+            np.asarray(initial_eth, dtype=np.float64))
+        if np.any((fee_percent < 0) | (fee_percent >= 100)):
+            raise ValueError("fee percent must be in [0, 100)")
+        self.fee_percent = fee_percent.ravel()
+        self.initial_tok = initial_tok.ravel()
+        self.initial_eth = initial_eth.ravel()
+
+    # All combinations of the given fees and initial (tok, eth) liquidity.
+    @classmethod
+    def grid(cls, fees: Iterable[int], initial_tok: Iterable[float], initial_eth: Iterable[float]) -> 'Configs':
+        f, t, e = np.meshgrid(np.asarray(list(fees)), np.asarray(list(initial_tok)), np.asarray(list(initial_eth)),
+                              indexing='ij')
+        return cls(f, t, e)
+
+    def __len__(self) -> int:
+        return len(self.fee_percent)
+
+
+def _fee(amount, fee_percent):
+    return np.ceil(amount * fee_percent / 100)
+
+
+def backtest(trades: np.ndarray, configs: Configs) -> Dict[str, np.ndarray]:
+    n = len(configs)
+    fee = configs.fee_percent
+    tok = configs.initial_tok.copy()
+    eth = configs.initial_eth.copy()
+    # As in Uniswap V1, the initial liquidity-token supply is the initial ETH deposit.
+    lqt = configs.initial_eth.copy()
+
+    eth_fees = np.zeros(n)
+    tok_fees = np.zeros(n)
+    slippage = np.zeros(n)
+    executed = np.zeros(n, dtype=np.int64)
+    swaps = np.zeros(n, dtype=np.int64)
+    reverted = np.zeros(n, dtype=np.int64)
+
+    for kind, amount, limit in trades.tolist():
+        if kind == BUY:
+            ok = amount < tok
+            traded_eth = np.ceil(eth * amount / np.where(ok, tok - amount, 1))
+            payment = np.ceil(traded_eth * 100 / (100 - fee))
+            if limit > 0:
+                ok &= payment <= limit
+            eth_fee = _fee(payment, fee)
+            tok_fee = _fee(amount, fee)
+            slip = payment / amount * tok / eth - 1
+            tok = np.where(ok, tok - amount + tok_fee, tok)
+            eth = np.where(ok, eth + payment, eth)
+        elif kind == SELL:
+            tok_fee = _fee(amount, fee)
+            traded_tok = amount - tok_fee
+            proceeds = np.floor(eth * traded_tok / (tok + traded_tok))
+            eth_fee = _fee(proceeds, fee)
+            payment = proceeds - eth_fee
+            ok = payment > 0
+            if limit > 0:
+                ok &= payment >= limit
+            slip = 1 - payment / amount * tok / eth
+            tok = np.where(ok, tok + amount, tok)
+            eth = np.where(ok, eth - payment, eth)
+        else:
+            minted = np.floor(lqt * amount)
+            if kind == MINT:
+                ok = minted > 0
+                tok = np.where(ok, tok + np.ceil(tok * minted / lqt), tok)
+                eth = np.where(ok, eth + np.ceil(eth * minted / lqt), eth)
+                lqt = np.where(ok, lqt + minted, lqt)
+            else:
+                ok = (minted > 0) & (minted < lqt)
+                tok = np.where(ok, tok - np.floor(tok * minted / lqt), tok)
+                eth = np.where(ok, eth - np.floor(eth * minted / lqt), eth)
+                lqt = np.where(ok, lqt - minted, lqt)
+            executed += ok
+            reverted += ~ok
+            continue
+
+        eth_fees += np.where(ok, eth_fee, 0)
+        tok_fees += np.where(ok, tok_fee, 0)
+        slippage += np.where(ok, slip, 0)
+        swaps += ok
+        executed += ok
+        reverted += ~ok
+
+    # Liquidity-token value is measured in ETH at the final pool price. `lp_return` compares it with the
+    # value of the initial deposit at the initial price, `lp_vs_hold` with just holding the deposit.
+    final_price = eth / tok
+    share_final = (eth + tok * final_price) / lqt
+    share_initial = (configs.initial_eth + configs.initial_tok * configs.initial_eth / configs.initial_tok) / configs.initial_eth
+    share_hold = (configs.initial_eth + configs.initial_tok * final_price) / configs.initial_eth
+
+    return {
+        'fee_percent': fee,
+        'initial_tok': configs.initial_tok,
+        'initial_eth': configs.initial_eth,
+        'final_tok': tok,
+        'final_eth': eth,
+        'eth_fees': eth_fees,
+        'tok_fees': tok_fees,
+        'fee_revenue_eth': eth_fees + tok_fees * final_price,
+        'mean_slippage': slippage / np.maximum(swaps, 1),
+        'lp_return': share_final / share_initial - 1,
+        'lp_vs_hold': share_final / share_hold - 1,
+        'executed': executed,
+        'reverted': reverted,
+    }
+
+
+# Random stream of `n` operations. Swap sizes are log-uniform between `min_amount` and `max_amount`
+# tokens; `liquidity_rate` of the operations are mints and burns of up to `max_liquidity_fraction`
+# of the liquidity-token supply.
+def synthetic_trades(n: int, seed: int = 0, min_amount: float = 1, max_amount: float = 1e3,
+                     liquidity_rate: float = 0.01, max_liquidity_fraction: float = 0.05) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    trades = np.zeros(n, dtype=TRADE_DTYPE)
+    is_liquidity = rng.random(n) < liquidity_rate
+    trades['kind'] = np.where(is_liquidity, rng.integers(MINT, BURN + 1, n), rng.integers(BUY, SELL + 1, n))
+    trades['amount'] = np.where(
+        is_liquidity,
+        rng.uniform(0, max_liquidity_fraction, n),
+        np.floor(np.exp(rng.uniform(np.log(min_amount), np.log(max_amount), n))))
+    return trades
+
+
+# Recover the trade stream of a live exchange from its `FeeDetails` and `MintBurnDetails` logs.
+# The logs don't record the traded amounts, so they are decoded from the calldata of the emitting transactions.
+def load_trades(exch, start_block: int = 0, stop_block: Optional[int] = None) -> np.ndarray:
+    from ape import chain
+
+    if stop_block is None:
+        stop_block = chain.blocks.head.number
+    logs = list(exch.FeeDetails.range(start_block, stop_block + 1))
+    logs += list(exch.MintBurnDetails.range(start_block, stop_block + 1))
+    logs.sort(key=lambda log: (log.block_number, log.log_index))
+
+    trades = np.zeros(len(logs), dtype=TRADE_DTYPE)
+    for i, log in enumerate(logs):
+        receipt = chain.provider.get_receipt(log.transaction_hash)
+        method, args = exch.decode_input(receipt.transaction.data)
+        args = list(args.values())
+        if method.startswith('buyTokens'):
+            trades[i] = (BUY, args[0], args[1])
+        elif method.startswith('sellTokens'):
+            trades[i] = (SELL, args[0], args[1])
+        else:
+            supply = exch.totalSupply(block_id=log.block_number - 1)
+            kind = MINT if method.startswith('mintLiquidityTokens') else BURN
+            trades[i] = (kind, args[0] / supply, 0)
+    return trades
+
+
+# Configurations are ranked by `lp_vs_hold` by default: `lp_return` also includes the price movement over the
+# trades, which mostly reflects the trades rather than the configuration.
+def format_report(report: Dict[str, np.ndarray], sort_by: str = 'lp_vs_hold', top: int = 20) -> str:
+    columns = ['fee_percent', 'initial_tok', 'initial_eth', 'lp_return', 'lp_vs_hold', 'fee_revenue_eth',
+               'mean_slippage', 'executed', 'reverted']
+    lines = ['\t'.join(columns)]
+    for i in np.argsort(-report[sort_by])[:top]:
+        lines.append('\t'.join('{:.6g}'.format(report[col][i]) for col in columns))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    configs = Configs.grid(fees=range(0, 20), initial_tok=[1e5, 1e6, 1e7, 1e8, 1e9], initial_eth=[1e5, 1e6, 1e7, 1e8, 1e9])
+    trades = synthetic_trades(1_000_000)
+    start = time.perf_counter()
+    report = backtest(trades, configs)
+    elapsed = time.perf_counter() - start
+    print(format_report(report))
+    print("{} trades x {} configurations in {:.1f}s".format(len(trades), len(configs), elapsed))
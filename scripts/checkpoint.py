@@ -0,0 +1,15 @@
+import json
+import os
+
+# Checkpoint files shared by the long-running scripts (`lp_tracker`, `access_list`).
+
+
+# Write `state` as JSON to `path` atomically: the data is written to a temporary file and synced before it
+# replaces `path`, so that an interrupted write never leaves a corrupt or partial checkpoint behind.
+def save_json(path: str, state, **dump_options) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, **dump_options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,362 @@
+from contextlib import contextmanager
+from threading import RLock
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import os
+import sqlite3
+import time
+
+from scripts.metrics import MetricsRegistry, default_registry
+
+# Asynchronous co-signing coordinator for 2-of-3 multisig transfers (`transfer2of3`).
+#
+# The first key holder (the proposer, who will send the transaction) adds transfers to a persistent queue
+# (an SQLite database) and moves on. Each co-signer pulls the proposals waiting for its signature in
+# batches and signs them concurrently, and a submitter sends the fully signed transfers as soon as they
+# are signed, in nonce order for each multisig address:
+#
+#     queue = ProposalQueue('cosign.db')
+#     coordinator = Coordinator(queue, tok)
+#     await coordinator.propose(multisig, recipient, 100, proposer=a1, cosigner=a2)
+#     await coordinator.run(cosigner_keys=[a2.private_key], accounts=[a1])
+#
+# Nonces are assigned when transfers are proposed: the next nonce on-chain (`next_nonce_transfer2of3`) for
+# the first pending transfer of a multisig address, and consecutive nonces after it. If a transfer fails,
+# the pending transfers of the same address are renumbered from the next nonce on-chain (the failed one may
+# or may not have used its nonce), and those whose nonce changed are signed again.
+#
+# The queue can be shared by several processes (e.g., one per co-signer): every read-modify-write of the
+# queue is a single `BEGIN IMMEDIATE` transaction.
+#
+# Errors (e.g., a node that is briefly unreachable) don't stop the coordinator: a co-signer releases the
+# batch it claimed, and either task backs off and tries again. Queue depth (per status), errors and the
+# time from proposal to signature and to submission are recorded in the metrics registry (see
+# `scripts/metrics.py`).
+
+PROPOSED, SIGNING, SIGNED, SUBMITTED, FAILED = 'proposed', 'signing', 'signed', 'submitted', 'failed'
+STATUSES = (PROPOSED, SIGNING, SIGNED, SUBMITTED, FAILED)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS proposals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token TEXT NOT NULL,
+    multisig TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    proposer TEXT NOT NULL,
+    cosigner TEXT NOT NULL,
+    nonce INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    r BLOB,
+    s BLOB,
+    v INTEGER,
+    created REAL NOT NULL,
+    txn_hash TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS proposals_by_status ON proposals (status, cosigner);
+CREATE INDEX IF NOT EXISTS proposals_by_multisig ON proposals (token, multisig, nonce);
+'''
+
+
+class Proposal(NamedTuple):
+    id: int
+    token: str
+    multisig: str
+    recipient: str
+    amount: int
+    proposer: str
+    cosigner: str
+    nonce: int
+    status: str
+    signature: Optional[Tuple[bytes, bytes, int]]
+    created: float
+    txn_hash: Optional[str]
+    error: Optional[str]
+
+
+def _proposal(row) -> Proposal:
+    (id, token, multisig, recipient, amount, proposer, cosigner, nonce, status, r, s, v, created, txn_hash,
+     error) = row
+    signature = (bytes(r), bytes(s), v) if r is not None else None
+    return Proposal(id, token, multisig, recipient, int(amount), proposer, cosigner, nonce, status, signature,
+                    created, txn_hash, error)
+
+
+def _address(account) -> str:
+    return getattr(account, 'address', account)
+
+
+# The address of the secret key `sk` (a hex string with a `0x` prefix).
+def key_address(sk: str) -> str:
+    from eth_keys import KeyAPI
+    from eth_keys.backends import NativeECCBackend
+
+    return KeyAPI(NativeECCBackend).PrivateKey(bytes.fromhex(sk[2:])).public_key.to_checksum_address()
+
+
+class ProposalQueue:
+    def __init__(self, path: str, registry: MetricsRegistry = default_registry) -> None:
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.lock = RLock()
+        self.registry = registry
+        self._update_depth()
+
+    def close(self) -> None:
+        self.db.close()
+
+    # Proposals that were being signed when their co-signer stopped are signed again. Only call this when no
+    # co-signer is running on the queue.
+    def recover(self) -> None:
+        with self._transaction():
+            self.db.execute('UPDATE proposals SET status = ? WHERE status = ?', (PROPOSED, SIGNING))
+
+    # Serializes writers within this process (the connection is shared between threads) and, through SQLite's
+    # write lock, with other processes.
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+            self._update_depth()
+
+    def _select(self, where: str, params: tuple = ()) -> List[Proposal]:
+        rows = self.db.execute('SELECT * FROM proposals WHERE ' + where, params).fetchall()
+        return [_proposal(row) for row in rows]
+
+    def get(self, proposal_id: int) -> Optional[Proposal]:
+        with self.lock:
+            proposals = self._select('id = ?', (proposal_id,))
+        return proposals[0] if proposals else None
+
+    def depth(self) -> Dict[str, int]:
+        with self.lock:
+            counts = dict(self.db.execute('SELECT status, COUNT(*) FROM proposals GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in STATUSES}
+
+    def _update_depth(self) -> None:
+        if not self.registry.enabled:
+            return
+        depth = self.depth()
+        with self.registry.lock:
+            for status, count in depth.items():
+                self.registry.cosign_depth.set(count, status)
+
+    def count_error(self, stage: str) -> None:
+        if self.registry.enabled:
+            with self.registry.lock:
+                self.registry.cosign_errors.inc(stage)
+
+    def _observe(self, stage: str, created: Iterable[float]) -> None:
+        if not self.registry.enabled:
+            return
+        now = time.time()
+        with self.registry.lock:
+            for start in created:
+                self.registry.cosign_latency.observe(now - start, stage)
+
+    # Queue a transfer; `next_nonce` is the nonce of the next transfer2of3 from `multisig` on-chain.
+    # Returns the proposal id.
+    def propose(self, token: str, multisig: str, recipient: str, amount: int, proposer: str, cosigner: str,
+                next_nonce: int) -> int:
+        with self._transaction():
+            (last,) = self.db.execute(
+                'SELECT MAX(nonce) FROM proposals WHERE token = ? AND multisig = ? AND status != ?',
+                (token, multisig, FAILED)).fetchone()
+            nonce = next_nonce if last is None else max(next_nonce, last + 1)
+            cursor = self.db.execute(
+                'INSERT INTO proposals (token, multisig, recipient, amount, proposer, cosigner, nonce, status, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (token, multisig, recipient, str(amount), proposer, cosigner, nonce, PROPOSED, time.time()))
+        return cursor.lastrowid
+
+    # Take up to `limit` proposals waiting for `cosigner`'s signature.
+    def claim(self, token: str, cosigner: str, limit: int) -> List[Proposal]:
+        claimed = []
+        with self._transaction():
+            proposals = self._select('token = ? AND cosigner = ? AND status = ? ORDER BY multisig, nonce LIMIT ?',
+                                     (token, cosigner, PROPOSED, limit))
+            for p in proposals:
+                cursor = self.db.execute('UPDATE proposals SET status = ? WHERE id = ? AND status = ?',
+                                         (SIGNING, p.id, PROPOSED))
+                if cursor.rowcount == 1:
+                    claimed.append(p)
+        return claimed
+
+    # Record signatures of claimed proposals. A signature is dropped if its proposal was renumbered (see
+    # `failed`) while it was being signed, since it is for the old nonce.
+    def signed(self, signatures: Iterable[Tuple[Proposal, Tuple[bytes, bytes, int]]]) -> None:
+        signatures = list(signatures)
+        with self._transaction():
+            self.db.executemany('UPDATE proposals SET status = ?, r = ?, s = ?, v = ? '
+                                'WHERE id = ? AND status = ? AND nonce = ?',
+                                [(SIGNED, r, s, v, p.id, SIGNING, p.nonce) for p, (r, s, v) in signatures])
+        self._observe(SIGNED, (p.created for p, _ in signatures))
+
+    # Return claimed proposals that could not be signed to the queue.
+    def release(self, proposals: Iterable[Proposal]) -> None:
+        with self._transaction():
+            self.db.executemany('UPDATE proposals SET status = ? WHERE id = ? AND status = ?',
+                                [(PROPOSED, p.id, SIGNING) for p in proposals])
+
+    # Signed proposals that can be submitted: those with no earlier nonce of the same multisig address
+    # still waiting for a signature. They are returned in nonce order.
+    def ready(self, token: str, limit: int) -> List[Proposal]:
+        with self.lock:
+            return self._select(
+                'token = ? AND status = ? AND NOT EXISTS (SELECT 1 FROM proposals AS earlier WHERE '
+                'earlier.token = proposals.token AND earlier.multisig = proposals.multisig AND '
+                'earlier.nonce < proposals.nonce AND earlier.status IN (?, ?)) ORDER BY multisig, nonce LIMIT ?',
+                (token, SIGNED, PROPOSED, SIGNING, limit))
+
+    def submitted(self, proposal: Proposal, txn_hash: str) -> None:
+        with self._transaction():
+            self.db.execute('UPDATE proposals SET status = ?, txn_hash = ? WHERE id = ?',
+                            (SUBMITTED, txn_hash, proposal.id))
+        self._observe(SUBMITTED, (proposal.created,))
+
+    # Mark a proposal as failed, and renumber the pending transfers of the same multisig address with
+    # consecutive nonces from `next_nonce`, the next nonce on-chain. Whether the failed transfer used its
+    # nonce (e.g., it was mined but waiting for the receipt timed out, or another transfer used it) is only
+    # known from the chain. Transfers whose nonce changes have to be signed again.
+    def failed(self, proposal: Proposal, error: str, next_nonce: int) -> None:
+        with self._transaction():
+            if next_nonce > proposal.nonce:
+                error += ' (nonce {} was used on-chain)'.format(proposal.nonce)
+            self.db.execute('UPDATE proposals SET status = ?, error = ? WHERE id = ?', (FAILED, error, proposal.id))
+            pending = self._select('token = ? AND multisig = ? AND status IN (?, ?, ?) ORDER BY nonce, id',
+                                   (proposal.token, proposal.multisig, PROPOSED, SIGNING, SIGNED))
+            self.db.executemany('UPDATE proposals SET nonce = ?, status = ?, r = NULL, s = NULL, v = NULL WHERE id = ?',
+                                [(next_nonce + i, PROPOSED, p.id) for i, p in enumerate(pending)
+                                 if p.nonce != next_nonce + i])
+
+
+class Coordinator:
+    def __init__(self, queue: ProposalQueue, tok, batch_size: int = 32, poll_interval: float = 0.2,
+                 max_backoff: float = 30.0) -> None:
+        self.queue = queue
+        self.tok = tok
+        self.token = tok.address
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff  # Longest wait before retrying after consecutive errors
+        self.on_error: Optional[Callable[[str, Exception], None]] = None
+
+    def next_nonce(self, multisig: str) -> int:
+        from scripts.multisig_token import next_nonce_transfer2of3
+
+        return next_nonce_transfer2of3(self.tok, multisig)
+
+    async def propose(self, multisig: str, recipient, amount: int, proposer, cosigner) -> int:
+        next_nonce = await asyncio.to_thread(self.next_nonce, multisig)
+        return await asyncio.to_thread(self.queue.propose, self.token, multisig, _address(recipient), amount,
+                                       _address(proposer), _address(cosigner), next_nonce)
+
+    def sign(self, sk: str, proposal: Proposal) -> Tuple[bytes, bytes, int]:
+        from scripts.multisig_token import sign_transfer2of3
+
+        signature = sign_transfer2of3(self.tok, sk, proposal.multisig, proposal.recipient, proposal.amount,
+                                      proposal.nonce)
+        return signature.encoded()
+
+    # Sign one batch of the proposals waiting for the owner of `address`. Returns False if there were none.
+    async def sign_batch(self, sk: str, address: str) -> bool:
+        batch = await asyncio.to_thread(self.queue.claim, self.token, address, self.batch_size)
+        if not batch:
+            return False
+        try:
+            signatures = await asyncio.gather(*(asyncio.to_thread(self.sign, sk, p) for p in batch))
+        except Exception:
+            await asyncio.to_thread(self.queue.release, batch)
+            raise
+        await asyncio.to_thread(self.queue.signed, zip(batch, signatures))
+        return True
+
+    # Send one batch of signed transfers, from the proposers' `accounts`, in nonce order. Returns False if
+    # there were none.
+    async def submit_batch(self, accounts: Dict[str, object]) -> bool:
+        ready = await asyncio.to_thread(self.queue.ready, self.token, self.batch_size)
+        for proposal in ready:
+            try:
+                receipt = await asyncio.to_thread(
+                    self.tok.transfer2of3, proposal.multisig, proposal.recipient, proposal.amount,
+                    proposal.nonce, proposal.signature, sender=accounts[proposal.proposer])
+            except Exception as err:
+                # If the nonce can't be read either, the proposal stays signed and is sent again after a backoff.
+                next_nonce = await asyncio.to_thread(self.next_nonce, proposal.multisig)
+                await asyncio.to_thread(self.queue.failed, proposal, str(err), next_nonce)
+                break  # Proposals of this address were renumbered; the batch is stale.
+            await asyncio.to_thread(self.queue.submitted, proposal, receipt.txn_hash)
+        return bool(ready)
+
+    # Run `step` until `stop` is set, polling while it has nothing to do and backing off exponentially
+    # (up to `max_backoff`) while it fails.
+    async def _loop(self, stage: str, step, stop: asyncio.Event) -> None:
+        backoff = self.poll_interval
+        while not stop.is_set():
+            try:
+                busy = await step()
+            except Exception as err:
+                self.queue.count_error(stage)
+                if self.on_error:
+                    self.on_error(stage, err)
+                await _wait(stop, backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.poll_interval
+            if not busy:
+                await _wait(stop, self.poll_interval)
+
+    # Sign the proposals waiting for the owner of `sk`, a batch at a time, until `stop` is set.
+    async def cosigner(self, sk: str, stop: asyncio.Event) -> None:
+        address = key_address(sk)
+        await self._loop('sign', lambda: self.sign_batch(sk, address), stop)
+
+    # Send the signed transfers, from the proposers' `accounts`, in nonce order, until `stop` is set.
+    async def submitter(self, accounts: Dict[str, object], stop: asyncio.Event) -> None:
+        await self._loop('submit', lambda: self.submit_batch(accounts), stop)
+
+    async def run(self, cosigner_keys: Iterable[str], accounts: Iterable, stop: Optional[asyncio.Event] = None) -> None:
+        stop = stop or asyncio.Event()
+        accounts = {account.address: account for account in accounts}
+        try:
+            await asyncio.gather(self.submitter(accounts, stop), *(self.cosigner(sk, stop) for sk in cosigner_keys))
+        finally:
+            stop.set()  # If one task is cancelled, the others stop too.
+
+
+async def _wait(stop: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+# `ape run cosign` runs the coordinator for the token at $COSIGN_TOKEN with the queue in $COSIGN_DB
+# (default `cosign.db`), for local testing: every test account is both a proposer and a co-signer.
+# Metrics are served on $COSIGN_METRICS_PORT if it is set.
+def main():
+    from ape import accounts, project
+    from scripts.multisig_token import grade_multisig
+
+    if not grade_multisig:
+        print('The multisig token is not implemented (set multisig_token.grade_multisig = True).')
+        return
+    registry = MetricsRegistry(enabled=True)
+    if os.environ.get('COSIGN_METRICS_PORT'):
+        registry.serve(int(os.environ['COSIGN_METRICS_PORT']))
+    queue = ProposalQueue(os.environ.get('COSIGN_DB', 'cosign.db'), registry)
+    queue.recover()
+    tok = project.RUToken.at(os.environ['COSIGN_TOKEN'])
+    test_accounts = list(accounts.test_accounts)
+    coordinator = Coordinator(queue, tok)
+    coordinator.on_error = lambda stage, err: print('{} failed, retrying: {}'.format(stage, err))
+    print('Coordinating {} ({})'.format(tok.address, queue.depth()))
+    asyncio.run(coordinator.run([a.private_key for a in test_accounts], test_accounts))
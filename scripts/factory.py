@@ -0,0 +1,191 @@
+from typing import List, Optional, Sequence, Tuple
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+
+# Helpers for `RUFactory`, which creates RUToken and RUExchange instances as EIP-1167 minimal proxies.
+#
+#     factory = deploy_factory(account)
+#     tokens = create_tokens(factory, [(100, 10 ** 15)] * 50, account)
+#     exchanges = create_exchanges(factory, 50, account)
+#
+# Addresses are deterministic (CREATE2): `predict_address` gives the address of an instance before it is
+# created, which is also how the helpers find the instances they created without decoding any logs.
+#
+# `ape run factory` benchmarks deployment gas and time of direct deployment against the factory, and then
+# the wall-clock time of the test suite (the paths in $FACTORY_BENCH_TESTS, default `tests`) with each.
+
+PROXY_PREFIX = bytes.fromhex('3d602d80600a3d3981f3363d3d373d3d3d363d73')
+PROXY_SUFFIX = bytes.fromhex('5af43d82803e903d91602b57fd5bf3')
+
+
+def proxy_creation_code(implementation: str) -> bytes:
+    return PROXY_PREFIX + to_canonical_address(implementation) + PROXY_SUFFIX
+
+
+def create2_address(deployer: str, salt: bytes, init_code: bytes) -> str:
+    digest = keccak(b'\xff' + to_canonical_address(deployer) + salt + keccak(init_code))
+    return to_checksum_address(digest[12:])
+
+
+# The salt the factory passes to CREATE2 for `salt` chosen by `sender` (`keccak256(abi.encode(sender, salt))`).
+def factory_salt(sender: str, salt: bytes) -> bytes:
+    return keccak(b'\x00' * 12 + to_canonical_address(sender) + salt)
+
+
+def predict_address(factory_address: str, implementation: str, sender: str, salt: bytes) -> str:
+    return create2_address(factory_address, factory_salt(sender, salt), proxy_creation_code(implementation))
+
+
+def make_salts(count: int, start: int = 0) -> List[bytes]:
+    return [i.to_bytes(32, 'big') for i in range(start, start + count)]
+
+
+def _address(account) -> str:
+    return getattr(account, 'address', account)
+
+
+def deploy_factory(account):
+    from ape import project
+
+    token_implementation = project.RUToken.deploy(0, 0, sender=account)
+    exchange_implementation = project.RUExchange.deploy(sender=account)
+    return project.RUFactory.deploy(token_implementation, exchange_implementation, sender=account)
+
+
+# Create one token per (tokenPrice, maxTokens) pair, `batch_size` per transaction. Salts default to a
+# counter continuing after the tokens `sender` already created, so repeated calls don't collide.
+def create_tokens(factory, params: Sequence[Tuple[int, int]], sender, salts: Optional[Sequence[bytes]] = None,
+                  batch_size: int = 50) -> list:
+    from ape import project
+
+    if salts is None:
+        salts = _free_salts(factory, factory.tokenImplementation(), sender, len(params))
+    for i in range(0, len(params), batch_size):
+        batch = params[i:i + batch_size]
+        factory.createTokens([p[0] for p in batch], [p[1] for p in batch], list(salts[i:i + batch_size]), sender=sender)
+    implementation = factory.tokenImplementation()
+    return [project.RUToken.at(predict_address(factory.address, implementation, _address(sender), salt))
+            for salt in salts]
+
+
+def create_exchanges(factory, count: int, sender, salts: Optional[Sequence[bytes]] = None, batch_size: int = 50) -> list:
+    from ape import project
+
+    if salts is None:
+        salts = _free_salts(factory, factory.exchangeImplementation(), sender, count)
+    for i in range(0, count, batch_size):
+        factory.createExchanges(list(salts[i:i + batch_size]), sender=sender)
+    implementation = factory.exchangeImplementation()
+    return [project.RUExchange.at(predict_address(factory.address, implementation, _address(sender), salt))
+            for salt in salts]
+
+
+_next_salts = {}
+
+
+# `count` consecutive counter salts, starting after the last ones handed out for the same factory,
+# implementation and sender, and at the first one whose address is still free.
+def _free_salts(factory, implementation: str, sender, count: int) -> List[bytes]:
+    from ape import chain
+
+    key = (factory.address, implementation, _address(sender))
+    start = _next_salts.get(key, 0)
+    while chain.provider.get_code(predict_address(factory.address, implementation, _address(sender),
+                                                  start.to_bytes(32, 'big'))):
+        start += 1
+    _next_salts[key] = start + count
+    return make_salts(count, start)
+
+
+_factories = {}
+
+
+# The factory the tests clone from. The `ru_factory` fixture in tests/conftest.py deploys it once per session,
+# before ape takes the isolation snapshots tests are reverted to; it is deployed again only if the chain was
+# reverted to before it existed anyway.
+def cached_factory(account):
+    from ape import chain
+
+    factory = _factories.get(chain.chain_id)
+    if factory is None or not chain.provider.get_code(factory.address):
+        factory = _factories[chain.chain_id] = deploy_factory(account)
+    return factory
+
+
+def _gas(receipts) -> int:
+    return sum(receipt.gas_used for receipt in receipts)
+
+
+def benchmark(account, count: int = 50, batch_size: int = 25) -> List[Tuple[str, int, float]]:
+    from ape import project
+
+    rows = []
+    start = time.perf_counter()
+    receipts = [project.RUToken.deploy(100, 10 ** 15, sender=account).receipt for _ in range(count)]
+    rows.append(('RUToken direct', _gas(receipts), time.perf_counter() - start))
+    start = time.perf_counter()
+    receipts = [project.RUExchange.deploy(sender=account).receipt for _ in range(count)]
+    rows.append(('RUExchange direct', _gas(receipts), time.perf_counter() - start))
+
+    # One-off cost on top of the two implementations, which cost as much as one direct deployment each.
+    factory = deploy_factory(account)
+    rows.append(('RUFactory deploy', _gas([factory.receipt]), 0.0))
+    start = time.perf_counter()
+    salts = make_salts(count, 10 ** 9)
+    receipts = [factory.createToken(100, 10 ** 15, salt, sender=account) for salt in salts]
+    rows.append(('RUToken clone', _gas(receipts), time.perf_counter() - start))
+    start = time.perf_counter()
+    receipts = [factory.createExchange(salt, sender=account) for salt in salts]
+    rows.append(('RUExchange clone', _gas(receipts), time.perf_counter() - start))
+
+    salts = make_salts(count, 2 * 10 ** 9)
+    start = time.perf_counter()
+    batches = [salts[i:i + batch_size] for i in range(0, count, batch_size)]
+    receipts = [factory.createTokens([100] * len(batch), [10 ** 15] * len(batch), batch, sender=account)
+                for batch in batches]
+    rows.append(('RUToken batched', _gas(receipts), time.perf_counter() - start))
+    start = time.perf_counter()
+    receipts = [factory.createExchanges(batch, sender=account) for batch in batches]
+    rows.append(('RUExchange batched', _gas(receipts), time.perf_counter() - start))
+    return rows
+
+
+# Wall-clock seconds and exit status of `ape test` on `paths`, with contracts deployed directly and as clones.
+def benchmark_suite(paths: Sequence[str]) -> List[Tuple[str, float, int]]:
+    from ape import project
+
+    ape = shutil.which('ape', path=os.path.dirname(sys.executable)) or 'ape'
+    rows = []
+    for label, clone in (('suite direct', False), ('suite clone', True)):
+        env = {k: v for k, v in os.environ.items() if k != 'RU_CLONE_DEPLOY'}
+        if clone:
+            env['RU_CLONE_DEPLOY'] = '1'
+        start = time.perf_counter()
+        status = subprocess.run([ape, 'test', '-q', *paths], cwd=project.path, env=env,
+                                stdout=subprocess.DEVNULL).returncode
+        rows.append((label, time.perf_counter() - start, status))
+    return rows
+
+
+def main():
+    from ape import accounts
+
+    count = int(os.environ.get('FACTORY_BENCH_COUNT', 50))
+    rows = benchmark(accounts.test_accounts[0], count)
+    print('{} instances each'.format(count))
+    print('{:20} {:>12} {:>12} {:>10} {:>12}'.format('', 'gas', 'gas/each', 'seconds', 'ms/each'))
+    for label, gas, seconds in rows:
+        n = 1 if label == 'RUFactory deploy' else count
+        print('{:20} {:>12} {:>12} {:>10.2f} {:>12.2f}'.format(label, gas, gas // n, seconds, seconds / n * 1000))
+
+    paths = os.environ.get('FACTORY_BENCH_TESTS', 'tests').split()
+    if paths:
+        print()
+        print('ape test {}'.format(' '.join(paths)))
+        for label, seconds, status in benchmark_suite(paths):
+            print('{:20} {:>10.2f}s{}'.format(label, seconds, '' if status == 0 else '  (exit status {})'.format(status)))
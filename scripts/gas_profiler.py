@@ -0,0 +1,236 @@
+from bisect import bisect_right
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import os
+import re
+
+from eth_utils import to_checksum_address
+
+# Per-line and per-function gas profiler for RUToken and RUExchange.
+#
+# Transactions are traced with `debug_traceTransaction` (so this needs a provider that supports it,
+# e.g. the anvil node from docker-compose.yml), and the program counter of every step is mapped back
+# to a Solidity source line through the runtime source map produced by the compiler.
+#
+# Run with `ape run gas_profiler --network ethereum:local:foundry`. Results are written to the directory
+# in $GAS_PROFILE_DIR (default `gas_profile/`):
+#  * `lines.tsv`     --- gas per (contract, source line).
+#  * `functions.tsv` --- gas per (contract, function).
+#  * `gas.folded`    --- folded stacks (`RUExchange;buyTokens;RUToken;transferFrom;ru_token.sol:97 1234`),
+#                        which can be fed to flamegraph.pl or speedscope.
+
+PROFILED_CONTRACTS = ('RUToken', 'RUExchange')
+
+CALL_OPS = ('CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL')
+
+
+# Decompress a solc source map (`s:l:f:j;...`, where empty fields repeat the previous entry)
+# into one (start, length, file index, jump) entry per instruction.
+def decode_sourcemap(srcmap: str) -> List[Tuple[int, int, int, str]]:
+    entries = []
+    prev = [0, 0, 0, '-']
+    for item in srcmap.split(';'):
+        fields = item.split(':')
+        for i, field in enumerate(fields[:4]):
+            if field != '':
+                prev[i] = field if i == 3 else int(field)
+        entries.append(tuple(prev))
+    return entries
+
+
+# Map each program counter in `bytecode` to its instruction index (PUSH1..PUSH32 carry immediate data).
+def instruction_indices(bytecode: bytes) -> Dict[int, int]:
+    indices = {}
+    pc = 0
+    index = 0
+    while pc < len(bytecode):
+        indices[pc] = index
+        op = bytecode[pc]
+        pc += 1 + (op - 0x5f if 0x60 <= op <= 0x7f else 0)
+        index += 1
+    return indices
+
+
+# Returns (name, start offset, end offset) for every function-like block in a Solidity source.
+def function_spans(source: str) -> List[Tuple[str, int, int]]:
+    spans = []
+    for match in re.finditer(r'\b(?:function\s+(\w+)|(constructor|receive|fallback))\s*\(', source):
+        body = source.find('{', match.end())
+        semicolon = source.find(';', match.end())
+        if body < 0 or 0 <= semicolon < body:
+            continue  # Declaration without a body (interface or abstract function).
+        depth = 0
+        for end in range(body, len(source)):
+            if source[end] == '{':
+                depth += 1
+            elif source[end] == '}':
+                depth -= 1
+                if depth == 0:
+                    break
+        spans.append((match.group(1) or match.group(2), match.start(), end))
+    return spans
+
+
+class SourceMapper:
+    # `sources` are the (name, text) of the source units of the compilation, indexed by solc source id.
+    # Ids past them belong to sources the compiler generated itself (ABI coders, checked arithmetic).
+    def __init__(self, name: str, bytecode: bytes, srcmap: str, sources: Sequence[Tuple[str, str]]) -> None:
+        self.name = name
+        self.pc_index = instruction_indices(bytecode)
+        self.srcmap = decode_sourcemap(srcmap)
+        self.sources = [(source_name, [0] + [i + 1 for i, c in enumerate(text) if c == '\n'], function_spans(text))
+                        for source_name, text in sources]
+
+    # solc numbers the source units of a compilation in the order of their sorted names. All the project's
+    # contracts share a compiler version, so ape compiles them (and the interfaces they import) together.
+    @classmethod
+    def from_contract_type(cls, contract_type, project) -> 'SourceMapper':
+        bytecode = bytes.fromhex(contract_type.runtime_bytecode.bytecode.removeprefix('0x'))
+        srcmap = contract_type.sourcemap
+        srcmap = getattr(srcmap, 'root', srcmap)
+        for base in (project.path, project.contracts_folder):
+            if (base / contract_type.source_id).is_file():
+                break
+        else:
+            raise FileNotFoundError(contract_type.source_id)
+        names = sorted(path.relative_to(base).as_posix() for path in project.contracts_folder.rglob('*.sol'))
+        sources = [(Path(name).name, (base / name).read_text()) for name in names]
+        return cls(contract_type.name, bytecode, srcmap, sources)
+
+    # Returns (source name, line, function) for a program counter; the source and line are None for
+    # compiler-generated code.
+    def locate(self, pc: int) -> Tuple[Optional[str], Optional[int], str]:
+        index = self.pc_index.get(pc)
+        if index is None or index >= len(self.srcmap):
+            return (None, None, '<unknown>')
+        start, _, file_index, _ = self.srcmap[index]
+        if not 0 <= file_index < len(self.sources):
+            return (None, None, '<generated>')
+        source_name, line_starts, functions = self.sources[file_index]
+        line = bisect_right(line_starts, start)
+        for name, span_start, span_end in functions:
+            if span_start <= start <= span_end:
+                return (source_name, line, name)
+        return (source_name, line, '<dispatch>')
+
+
+# Gas consumed by each step itself. For call instructions this excludes the gas used by the callee,
+# which is attributed to the callee's own steps.
+def step_costs(struct_logs: List[dict]) -> List[int]:
+    costs = [0] * len(struct_logs)
+    frames = []  # Stack of [index of the call step, gas used inside the callee].
+    for i, step in enumerate(struct_logs):
+        nxt = struct_logs[i + 1] if i + 1 < len(struct_logs) else None
+        if nxt is not None and nxt['depth'] > step['depth']:
+            frames.append([i, 0])
+            continue
+        if nxt is not None and nxt['depth'] == step['depth']:
+            costs[i] = step['gas'] - nxt['gas']
+        else:
+            costs[i] = step['gasCost']
+        if frames:
+            frames[-1][1] += costs[i]
+        # Returning from one or more frames: charge the call steps for what the callee didn't use.
+        while frames and (nxt is None or nxt['depth'] <= struct_logs[frames[-1][0]]['depth']):
+            call_index, callee_gas = frames.pop()
+            resume_gas = nxt['gas'] if nxt is not None else struct_logs[call_index]['gas'] - struct_logs[call_index]['gasCost']
+            costs[call_index] = struct_logs[call_index]['gas'] - resume_gas - callee_gas
+            if frames:
+                frames[-1][1] += callee_gas + costs[call_index]
+    return costs
+
+
+class GasProfile:
+    def __init__(self, mappers: Dict[str, SourceMapper], contract_name: Callable[[str], Optional[str]]) -> None:
+        self.mappers = mappers
+        self.contract_name = contract_name
+        self.lines = defaultdict(int)
+        self.functions = defaultdict(int)
+        self.stacks = defaultdict(int)
+
+    def add_trace(self, receiver: str, struct_logs: List[dict], gas_used: Optional[int] = None) -> None:
+        costs = step_costs(struct_logs)
+        contracts = [self.contract_name(receiver) or receiver]
+        frames = [[contracts[0], '<dispatch>']]  # (contract, current function) for each call depth.
+        for step, cost in zip(struct_logs, costs):
+            depth = step['depth']
+            del contracts[depth:], frames[depth:]
+            contract = contracts[depth - 1]
+            mapper = self.mappers.get(contract)
+            source, line, function = mapper.locate(step['pc']) if mapper else (None, None, '<external>')
+            frames[depth - 1][-1] = function
+            location = '{}:{}'.format(source, line) if line is not None else function
+
+            self.lines[(contract, location)] += cost
+            self.functions[(contract, function)] += cost
+            stack = [name for frame in frames[:depth] for name in frame]
+            if line is not None:
+                stack.append(location)
+            self.stacks[';'.join(stack)] += cost
+
+            if step['op'] in CALL_OPS:
+                callee = to_checksum_address('0x' + step['stack'][-2].removeprefix('0x')[-40:].rjust(40, '0'))
+                contracts.append(self.contract_name(callee) or callee)
+                frames.append([contracts[-1], '<dispatch>'])
+            elif step['op'] in ('CREATE', 'CREATE2'):
+                contracts.append('<create>')
+                frames.append(['<create>', '<dispatch>'])
+
+        if gas_used is not None:
+            # Intrinsic gas (base cost and calldata) is charged before the first step.
+            intrinsic = gas_used - sum(costs)
+            self.functions[(contracts[0], '<intrinsic>')] += intrinsic
+            self.stacks['{};<intrinsic>'.format(contracts[0])] += intrinsic
+
+    def write(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / 'lines.tsv', 'w') as f:
+            f.write('contract\tline\tgas\n')
+            for (contract, line), gas in sorted(self.lines.items(), key=lambda kv: -kv[1]):
+                f.write('{}\t{}\t{}\n'.format(contract, line, gas))
+        with open(directory / 'functions.tsv', 'w') as f:
+            f.write('contract\tfunction\tgas\n')
+            for (contract, function), gas in sorted(self.functions.items(), key=lambda kv: -kv[1]):
+                f.write('{}\t{}\t{}\n'.format(contract, function, gas))
+        with open(directory / 'gas.folded', 'w') as f:
+            for stack, gas in sorted(self.stacks.items()):
+                if gas > 0:
+                    f.write('{} {}\n'.format(stack, gas))
+
+
+def trace_transaction(provider, txn_hash: str) -> List[dict]:
+    trace = provider.make_request('debug_traceTransaction',
+                                  [txn_hash, {'disableStorage': True, 'enableMemory': False, 'disableStack': False}])
+    return trace['structLogs']
+
+
+def profile_receipts(receipts) -> GasProfile:
+    from ape import chain, project
+
+    mappers = {name: SourceMapper.from_contract_type(getattr(project, name).contract_type, project)
+               for name in PROFILED_CONTRACTS}
+    names = {}
+
+    def contract_name(address: str) -> Optional[str]:
+        if address not in names:
+            contract_type = chain.contracts.get(address)
+            names[address] = contract_type.name if contract_type else None
+        return names[address]
+
+    profile = GasProfile(mappers, contract_name)
+    for receipt in receipts:
+        profile.add_trace(receipt.receiver, trace_transaction(chain.provider, receipt.txn_hash), receipt.gas_used)
+    return profile
+
+
+def main():
+    from ape import accounts
+    from scripts.workload import run_workload
+
+    profile = profile_receipts([receipt for _, receipt in run_workload(accounts.test_accounts)])
+    directory = Path(os.environ.get('GAS_PROFILE_DIR', 'gas_profile'))
+    profile.write(directory)
+    for (contract, function), gas in sorted(profile.functions.items(), key=lambda kv: -kv[1]):
+        print('{:12} {:24} {:>10}'.format(contract, function, gas))
+    print('Results written to {}'.format(directory))
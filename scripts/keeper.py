@@ -0,0 +1,223 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+from scripts.amm import buy_quote, sell_quote, reserves_after_buy, reserves_after_sell
+
+# Limit-order keeper for RUExchange.
+#
+# Resting orders are kept in two heaps indexed by their limit price per token: buys with the highest limit
+# first, sells with the lowest. The keeper follows new blocks, and only re-reads the pool reserves when the
+# exchange emitted logs in a block (i.e., when its reserves may have changed). It then pops just the orders
+# whose limit the new price crosses, checks each against an exact quote (`scripts/amm.py`) on the reserves
+# as updated by the orders matched before it, and submits the executable ones in price priority. The
+# contract's `maxPrice`/`minPrice` checks still protect every order if the pool moves before execution.
+#
+#     keeper = Keeper(exch, fee_percent=5)
+#     keeper.place(LimitOrder('buy', amount=10, limit=2000, sender=acct))
+#     asyncio.run(keeper.run())
+
+BUY, SELL = 'buy', 'sell'
+
+
+class LimitOrder:
+    def __init__(self, side: str, amount: int, limit: int, sender=None) -> None:
+        if side not in (BUY, SELL):
+            raise ValueError('side must be {!r} or {!r}'.format(BUY, SELL))
+        self.side = side
+        self.amount = amount  # Tokens to buy or sell
+        self.limit = limit  # Maximum total payment (buy) or minimum total proceeds (sell), in ETH
+        self.sender = sender
+        self.id: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return '<LimitOrder {} {} {} for {}>'.format(self.id, self.side, self.amount, self.limit)
+
+
+class OrderBook:
+    def __init__(self, fee_percent: int) -> None:
+        self.fee_percent = fee_percent
+        self.buys: List[Tuple[float, int, LimitOrder]] = []  # Keyed by -limit per token
+        self.sells: List[Tuple[float, int, LimitOrder]] = []  # Keyed by limit per token
+        self.orders: Dict[int, LimitOrder] = {}
+        self.ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def place(self, order: LimitOrder) -> int:
+        if order.id is None:
+            order.id = next(self.ids)
+        self.orders[order.id] = order
+        per_token = order.limit / order.amount
+        if order.side == BUY:
+            heapq.heappush(self.buys, (-per_token, order.id, order))
+        else:
+            heapq.heappush(self.sells, (per_token, order.id, order))
+        return order.id
+
+    # Cancelled orders stay in the heaps and are dropped when they reach the top.
+    def cancel(self, order_id: int) -> Optional[LimitOrder]:
+        return self.orders.pop(order_id, None)
+
+    # Remove and return the orders that are executable against reserves (`tok`, `eth`), in the order they
+    # should be submitted. Orders that cross the spot price but fail the exact quote stay in the book.
+    def match(self, tok: int, eth: int) -> List[LimitOrder]:
+        matched = []
+        deferred = []
+        # A buy pays more than the spot price per token plus the ETH fee, and a sale gets less than the spot
+        # price minus both fees, so only the orders whose limit crosses these bounds need an exact quote.
+        keep = 100 - self.fee_percent
+        while self.buys and tok > 0:
+            key, order_id, order = self.buys[0]
+            if order_id not in self.orders:
+                heapq.heappop(self.buys)
+                continue
+            if -key * keep * tok < 100 * eth:
+                break
+            heapq.heappop(self.buys)
+            if order.amount < tok:
+                quote = buy_quote(order.amount, tok, eth, self.fee_percent)
+                if quote[0] <= order.limit:
+                    tok, eth = reserves_after_buy(order.amount, tok, eth, quote)
+                    del self.orders[order_id]
+                    matched.append(order)
+                    continue
+            deferred.append((self.buys, (key, order_id, order)))
+        while self.sells and tok > 0:
+            key, order_id, order = self.sells[0]
+            if order_id not in self.orders:
+                heapq.heappop(self.sells)
+                continue
+            if key * 100 * 100 * tok > keep * keep * eth:
+                break
+            heapq.heappop(self.sells)
+            quote = sell_quote(order.amount, tok, eth, self.fee_percent)
+            if quote[0] >= order.limit:
+                tok, eth = reserves_after_sell(order.amount, tok, eth, quote)
+                del self.orders[order_id]
+                matched.append(order)
+                continue
+            deferred.append((self.sells, (key, order_id, order)))
+        for heap, entry in deferred:
+            heapq.heappush(heap, entry)
+        return matched
+
+
+class Keeper:
+    def __init__(self, exch, fee_percent: int, refresh_blocks: int = 100) -> None:
+        self.exch = exch
+        self.book = OrderBook(fee_percent)
+        self.refresh_blocks = refresh_blocks  # Re-read reserves at least this often, even without logs.
+        self.reserves: Optional[Tuple[int, int]] = None
+        self.refreshed_at = -1  # Block of the last reserves read
+        self.last_block: Optional[int] = None  # Last block processed
+        self.on_executed: Optional[Callable[[LimitOrder, object], None]] = None
+        self.on_failed: Optional[Callable[[LimitOrder, Exception], None]] = None
+
+    def place(self, order: LimitOrder) -> int:
+        return self.book.place(order)
+
+    def cancel(self, order_id: int) -> Optional[LimitOrder]:
+        return self.book.cancel(order_id)
+
+    def read_reserves(self, block_number: Optional[int] = None) -> Tuple[int, int]:
+        from ape import chain
+
+        tok = self.exch.tokenBalance(block_id=block_number)
+        eth = chain.provider.get_balance(self.exch.address, block_id=block_number)
+        return (tok, eth)
+
+    # True if the exchange emitted logs in blocks `from_block` to `to_block` (inclusive).
+    def exchange_logs(self, from_block: int, to_block: int) -> bool:
+        from ape import chain
+
+        logs = chain.provider.make_request('eth_getLogs', [{
+            'address': self.exch.address, 'fromBlock': hex(from_block), 'toBlock': hex(to_block)}])
+        return len(logs) > 0
+
+    def block_number(self) -> int:
+        from ape import chain
+
+        return chain.provider.get_block('latest').number
+
+    # Buys send `limit` ETH, like the tests do; sellers must have approved the exchange beforehand.
+    def submit(self, order: LimitOrder):
+        if order.side == BUY:
+            return self.exch.buyTokens(order.amount, order.limit, sender=order.sender, value=order.limit)
+        return self.exch.sellTokens(order.amount, order.limit, sender=order.sender)
+
+    # Process the blocks after the last processed one, up to `block_number`.
+    async def on_block(self, block_number: int) -> None:
+        first_block = block_number if self.last_block is None else self.last_block + 1
+        self.last_block = block_number
+        if self.reserves is None or block_number - self.refreshed_at >= self.refresh_blocks or \
+                await asyncio.to_thread(self.exchange_logs, first_block, block_number):
+            self.reserves = await asyncio.to_thread(self.read_reserves, block_number)
+            self.refreshed_at = block_number
+        for order in self.book.match(*self.reserves):
+            try:
+                receipt = await asyncio.to_thread(self.submit, order)
+            except Exception as err:
+                # Most likely the pool moved since the block we matched on: the order rests again. A reverted
+                # transaction emits no logs, so the reserves must be read again before the next match.
+                self.book.place(order)
+                self.reserves = None
+                if self.on_failed:
+                    self.on_failed(order, err)
+                continue
+            if self.on_executed:
+                self.on_executed(order, receipt)
+
+    # Follow new blocks until `stop` is set. The chain head is polled every `poll_interval` seconds; blocks
+    # that arrive while the keeper is busy are processed together.
+    async def run(self, stop: Optional[asyncio.Event] = None, poll_interval: float = 0.5) -> None:
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            head = await asyncio.to_thread(self.block_number)
+            if head != self.last_block:
+                await self.on_block(head)
+                continue
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Time matching against a book of `orders` resting orders while the pool price random-walks. Matched
+# orders are replaced by new ones around the current price, so the book stays the same size.
+def benchmark(orders: int = 10_000, blocks: int = 1_000, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    book = OrderBook(fee_percent=1)
+    tok, eth = 10 ** 12, 10 ** 15  # 1000 wei per token
+
+    def place_random():
+        amount = rng.randrange(1, 10 ** 6)
+        side = rng.choice((BUY, SELL))
+        spread = rng.uniform(0.02, 0.3)
+        per_token = eth / tok * (1 - spread if side == BUY else 1 + spread)
+        book.place(LimitOrder(side, amount, int(amount * per_token)))
+
+    for _ in range(orders):
+        place_random()
+    times = []
+    matched = 0
+    for _ in range(blocks):
+        eth = int(eth * rng.uniform(0.99, 1.01))
+        start = time.perf_counter()
+        executable = book.match(tok, eth)
+        times.append(time.perf_counter() - start)
+        matched += len(executable)
+        for _ in executable:
+            place_random()
+    times.sort()
+    print('{} resting orders, {} blocks, {} matched'.format(orders, blocks, matched))
+    print('match per block: median {:.1f}us, p99 {:.1f}us, max {:.1f}us'.format(
+        times[len(times) // 2] * 1e6, times[int(len(times) * 0.99)] * 1e6, times[-1] * 1e6))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,342 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread, local
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import http.client
+import itertools
+import json
+import random
+import time
+
+import click
+
+# Open-loop load generator for RUToken and RUExchange on a local anvil node.
+#
+#     ape run loadgen --network ethereum:local:foundry --rate 200 --duration 60 --senders 500 \
+#         --mix transfer=6,transfer2of3=1,buyTokens=2,sellTokens=2
+#
+# Senders are fresh keys funded with `anvil_setBalance`, so their number is not limited by the accounts
+# anvil was started with. Operations arrive as a Poisson process at `--rate` per second regardless of
+# how fast earlier ones complete, and latency is measured from the scheduled arrival time to the block
+# that includes the transaction (so queueing in the client counts too). Transactions are signed locally
+# and sent as raw JSON-RPC requests; receipts are collected once per block with `eth_getBlockReceipts`.
+# Start anvil with `--block-time` to measure with realistic blocks rather than one block per transaction.
+
+DEFAULT_MIX = 'transfer=6,transfer2of3=1,buyTokens=2,sellTokens=2'
+FUNDING = 10 ** 24
+
+
+class RpcError(Exception):
+    pass
+
+
+class Rpc:
+    def __init__(self, url: str) -> None:
+        self.url = urlparse(url)
+        self.ids = itertools.count()
+        self.local = local()  # One keep-alive connection per thread.
+
+    def call(self, method: str, *params):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=60)
+        body = json.dumps({'jsonrpc': '2.0', 'id': next(self.ids), 'method': method, 'params': list(params)})
+        try:
+            conn.request('POST', self.url.path or '/', body, {'Content-Type': 'application/json'})
+            response = json.loads(conn.getresponse().read())
+        except (OSError, http.client.HTTPException):
+            self.local.conn = None
+            raise
+        if 'error' in response:
+            raise RpcError('{}: {}'.format(method, response['error'].get('message')))
+        return response['result']
+
+
+class Sender:
+    def __init__(self, account) -> None:
+        self.account = account
+        self.address = account.address
+        self.key = account.key
+        self.nonce = 0
+        self.lock = Lock()  # Keeps nonces in the order transactions are sent.
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'p50': None, 'p90': None, 'p99': None, 'max': None}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': values[-1]}
+
+
+class LoadGenerator:
+    def __init__(self, rpc: Rpc, tok, exch=None, senders: int = 100, concurrency: int = 32, seed: int = 0) -> None:
+        from eth_account import Account
+
+        self.rpc = rpc
+        self.tok = tok
+        self.exch = exch
+        self.chain_id = int(rpc.call('eth_chainId'), 16)
+        self.rng = random.Random(seed)
+        self.senders = [Sender(Account.create()) for _ in range(senders)]
+        self.multisigs = []  # (multisig address, proposer, co-signer key)
+        self.busy_multisigs = set()
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.encoded = {}
+        self.gas_limits = {}
+        self.lock = Lock()
+        self.pending = {}  # Transaction hash -> (operation, scheduled time, on_included)
+        self.results = {}  # Operation -> counters and latencies
+        self.blocks = []
+        self.last_block = int(rpc.call('eth_blockNumber'), 16)
+        self.stopped = Event()
+
+    # --- Transactions ------------------------------------------------------
+
+    # Calldata for `contract.method(*args)`, cached since the same few argument combinations repeat.
+    def encode(self, contract, method: str, *args) -> str:
+        key = (contract.address, method) + tuple(str(arg) for arg in args)
+        data = self.encoded.get(key)
+        if data is None:
+            data = self.encoded[key] = '0x' + bytes(getattr(contract, method).encode_input(*args)).hex()
+        return data
+
+    # Sign and send a transaction. If `pending` is given, it is registered under the transaction's hash
+    # *before* sending it: with automining, the block including it can be processed before the call returns.
+    def send(self, sender: Sender, to: str, data: str, value: int = 0, gas: int = 1_000_000,
+             pending: Optional[tuple] = None) -> str:
+        with sender.lock:
+            txn = {'chainId': self.chain_id, 'nonce': sender.nonce, 'to': to, 'data': data, 'value': value, 'gas': gas,
+                   'maxFeePerGas': 10 ** 11, 'maxPriorityFeePerGas': 10 ** 9, 'type': 2}
+            signed = sender.account.sign_transaction(txn)
+            raw = getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+            txn_hash = '0x' + bytes(signed.hash).hex()
+            if pending is not None:
+                with self.lock:
+                    self.pending[txn_hash] = pending
+            try:
+                self.rpc.call('eth_sendRawTransaction', '0x' + bytes(raw).hex())
+            except Exception:
+                if pending is not None:
+                    with self.lock:
+                        self.pending.pop(txn_hash, None)
+                raise
+            sender.nonce += 1
+        return txn_hash
+
+    def wait(self, txn_hash: str) -> dict:
+        while True:
+            receipt = self.rpc.call('eth_getTransactionReceipt', txn_hash)
+            if receipt is not None:
+                if receipt['status'] != '0x1':
+                    raise RpcError('setup transaction {} reverted'.format(txn_hash))
+                return receipt
+            time.sleep(0.05)
+
+    # --- Setup -------------------------------------------------------------
+
+    def setup(self, multisigs: int = 0) -> None:
+        tok, exch = self.tok, self.exch
+        price = tok.tokenPrice()
+        for sender in self.senders:
+            self.rpc.call('anvil_setBalance', sender.address, hex(FUNDING))
+        hashes = [self.send(s, tok.address, self.encode(tok, 'mint'), value=1000 * price) for s in self.senders]
+        if exch is not None:
+            hashes += [self.send(s, tok.address, self.encode(tok, 'approve', exch.address, 2 ** 255)) for s in self.senders]
+        for i in range(min(multisigs, len(self.senders) - 2)):
+            s1, s2, s3 = self.senders[i:i + 3]
+            hashes.append(self.send(s1, tok.address, self.encode(tok, 'registerMultisigAddress', s1.address, s2.address, s3.address)))
+            multisig = tok.getMultisigAddress(s1.address, s2.address, s3.address)
+            hashes.append(self.send(s1, tok.address, self.encode(tok, 'transfer', multisig, 500)))
+            self.multisigs.append((multisig, s1, '0x' + bytes(s2.key).hex()))
+        for txn_hash in hashes:
+            self.wait(txn_hash)
+        self.last_block = int(self.rpc.call('eth_blockNumber'), 16)
+
+    # Returns (sender, to, data, value, on_included) for a random instance of `operation`,
+    # or None if it can't be issued right now.
+    def build(self, operation: str):
+        sender = self.rng.choice(self.senders)
+        if operation == 'transfer':
+            dst = self.rng.choice(self.senders)
+            return (sender, self.tok.address, self.encode(self.tok, 'transfer', dst.address, 1), 0, None)
+        if operation == 'buyTokens':
+            max_price = 10 ** 18
+            return (sender, self.exch.address, self.encode(self.exch, 'buyTokens', 1, max_price), max_price, None)
+        if operation == 'sellTokens':
+            return (sender, self.exch.address, self.encode(self.exch, 'sellTokens', 1, 0), 0, None)
+        if operation == 'transfer2of3':
+            from scripts.multisig_token import generate_nonce_and_second_signature_transfer2of3
+
+            # Multisig nonces are sequential, so only one transfer per multisig address can be in flight.
+            with self.lock:
+                free = [m for m in self.multisigs if m[0] not in self.busy_multisigs]
+                if not free:
+                    return None
+                multisig, proposer, cosigner_key = self.rng.choice(free)
+                self.busy_multisigs.add(multisig)
+            dst = self.rng.choice(self.senders)
+            nonce, sig = generate_nonce_and_second_signature_transfer2of3(self.tok, cosigner_key, multisig, dst.address, 1)
+            data = '0x' + bytes(self.tok.transfer2of3.encode_input(multisig, dst.address, 1, nonce, sig.encoded())).hex()
+            return (proposer, self.tok.address, data, 0, lambda: self.busy_multisigs.discard(multisig))
+        raise ValueError('unknown operation {}'.format(operation))
+
+    # Estimate each operation's gas once, with a margin, so that the limits don't waste block space.
+    def estimate_gas(self, operations) -> None:
+        for operation in operations:
+            built = self.build(operation)
+            if built is None:
+                continue
+            sender, to, data, value, on_included = built
+            gas = self.rpc.call('eth_estimateGas', {'from': sender.address, 'to': to, 'data': data, 'value': hex(value)})
+            self.gas_limits[operation] = int(int(gas, 16) * 1.3)
+            if on_included:
+                on_included()
+
+    # --- Load --------------------------------------------------------------
+
+    def issue(self, operation: str, scheduled: float) -> None:
+        result = self.results[operation]
+        built = self.build(operation)
+        if built is None:
+            with self.lock:
+                result['skipped'] += 1
+            return
+        sender, to, data, value, on_included = built
+        try:
+            self.send(sender, to, data, value, self.gas_limits.get(operation, 1_000_000),
+                      pending=(operation, scheduled, on_included))
+        except Exception:
+            with self.lock:
+                result['send_errors'] += 1
+                if on_included:
+                    on_included()
+
+    def watch_blocks(self) -> None:
+        while not self.stopped.is_set() or self.pending:
+            head = int(self.rpc.call('eth_blockNumber'), 16)
+            for number in range(self.last_block + 1, head + 1):
+                block = self.rpc.call('eth_getBlockByNumber', hex(number), False)
+                receipts = self.rpc.call('eth_getBlockReceipts', hex(number))
+                now = time.perf_counter()
+                self.blocks.append({'number': number, 'gas_used': int(block['gasUsed'], 16),
+                                    'transactions': len(block['transactions']), 'time': now})
+                with self.lock:
+                    for receipt in receipts:
+                        entry = self.pending.pop(receipt['transactionHash'], None)
+                        if entry is None:
+                            continue
+                        operation, scheduled, on_included = entry
+                        result = self.results[operation]
+                        result['latencies'].append(now - scheduled)
+                        result['gas'] += int(receipt['gasUsed'], 16)
+                        if receipt['status'] != '0x1':
+                            result['reverts'] += 1
+                        if on_included:
+                            on_included()
+            self.last_block = head
+            time.sleep(0.02)
+
+    def run(self, mix: Dict[str, float], rate: float, duration: float, drain_timeout: float = 60) -> dict:
+        operations, weights = list(mix), list(mix.values())
+        self.results = {op: {'latencies': [], 'reverts': 0, 'send_errors': 0, 'skipped': 0, 'gas': 0, 'issued': 0}
+                        for op in operations}
+        watcher = Thread(target=self.watch_blocks, daemon=True)
+        watcher.start()
+
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled < start + duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            operation = self.rng.choices(operations, weights)[0]
+            self.results[operation]['issued'] += 1
+            self.executor.submit(self.issue, operation, scheduled)
+            scheduled += self.rng.expovariate(rate)
+        self.executor.shutdown(wait=True)
+        sent_end = time.perf_counter()
+
+        self.stopped.set()
+        watcher.join(drain_timeout)
+        return self.report(rate, duration, start, sent_end)
+
+    def report(self, rate: float, duration: float, start: float, sent_end: float) -> dict:
+        blocks = [b for b in self.blocks if b['time'] >= start]
+        included = sum(len(r['latencies']) for r in self.results.values())
+        elapsed = (blocks[-1]['time'] - start) if blocks else 0
+        operations = {}
+        for op, r in self.results.items():
+            n = len(r['latencies'])
+            operations[op] = {
+                'issued': r['issued'], 'included': n, 'skipped': r['skipped'], 'send_errors': r['send_errors'],
+                'revert_rate': r['reverts'] / n if n else None,
+                'mean_gas': r['gas'] / n if n else None,
+                'latency_s': percentiles(r['latencies']),
+            }
+        gas = [b['gas_used'] for b in blocks]
+        return {
+            'offered_rate': rate,
+            'duration_s': duration,
+            'send_duration_s': sent_end - start,
+            'senders': len(self.senders),
+            'included': included,
+            'achieved_tps': included / elapsed if elapsed else 0,
+            'lost': len(self.pending),
+            'latency_s': percentiles([l for r in self.results.values() for l in r['latencies']]),
+            'blocks': len(blocks),
+            'gas_per_block': {'mean': sum(gas) / len(gas) if gas else None, 'max': max(gas, default=None)},
+            'txs_per_block': {'mean': included / len(blocks) if blocks else None,
+                              'max': max((b['transactions'] for b in blocks), default=None)},
+            'operations': operations,
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+@click.command(short_help='Drive an open-loop transaction mix against a local anvil node')
+@click.option('--rate', default=100.0, help='Offered operations per second.')
+@click.option('--duration', default=30.0, help='Seconds to generate load for.')
+@click.option('--senders', default=200, help='Number of funded sender accounts.')
+@click.option('--multisigs', default=20, help='Number of multisig addresses used by transfer2of3.')
+@click.option('--concurrency', default=32, help='Concurrent submitting threads.')
+@click.option('--mix', default=DEFAULT_MIX, help='Operation weights, e.g. transfer=6,buyTokens=2.')
+@click.option('--output', default=None, help='Write the JSON report here instead of stdout.')
+@click.option('--seed', default=0)
+def cli(rate, duration, senders, multisigs, concurrency, mix, output, seed):
+    from ape import accounts, chain, project
+    from scripts.exchange import grade_exchange
+    from scripts.multisig_token import grade_multisig
+    from tests.test_tokens import deploy_ru_token
+
+    mix = parse_mix(mix)
+    if not grade_multisig:
+        mix.pop('transfer2of3', None)
+    if not grade_exchange:
+        mix.pop('buyTokens', None)
+        mix.pop('sellTokens', None)
+
+    owner = accounts.test_accounts[0]
+    tok = deploy_ru_token(project.RUToken, 100, 10 ** 30, owner)
+    exch = None
+    if grade_exchange:
+        from tests.test_exchange import deploy_ru_exchange, initialize_ru_exchange
+
+        exch = deploy_ru_exchange(owner)
+        initialize_ru_exchange(exch, tok, owner, 1, 10 ** 9, 10 ** 12)
+
+    gen = LoadGenerator(Rpc(chain.provider.uri), tok, exch, senders, concurrency, seed)
+    gen.setup(multisigs if 'transfer2of3' in mix else 0)
+    gen.estimate_gas(mix)
+    report = json.dumps(gen.run(mix, rate, duration), indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(report)
+    else:
+        click.echo(report)
@@ -0,0 +1,239 @@
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+
+from scripts.checkpoint import save_json
+
+# Incremental liquidity-provider tracker for RUExchange.
+#
+# Consumes the exchange's `MintBurnDetails`, `FeeDetails` and liquidity-token `Transfer` events in a
+# single pass and keeps, for each provider, their liquidity tokens, the cost basis of their deposits and
+# the ETH and token fees accrued to them. Fees are distributed with a "fees per share" accumulator
+# (as in Uniswap V3 or MasterChef-style staking contracts), so every event is O(1) regardless of the
+# number of providers. The state can be checkpointed to disk and resumed from the last processed log.
+#
+#     tracker = LPTracker.load('lp.json')
+#     follow(exch, tracker, checkpoint_path='lp.json')
+#     print(tracker.position(provider))
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+SCALE = 10 ** 36  # Fixed-point scale of the fees-per-share accumulators.
+
+
+class Provider:
+    def __init__(self) -> None:
+        self.shares = 0
+        self.cost_tok = 0  # Tokens deposited for the current shares
+        self.cost_eth = 0  # ETH deposited for the current shares
+        self.withdrawn_tok = 0
+        self.withdrawn_eth = 0
+        self.fees_tok = 0  # Fees accrued up to the last settlement
+        self.fees_eth = 0
+        self.debt_tok = 0  # Accumulator value (times shares) at the last settlement
+        self.debt_eth = 0
+
+    def to_json(self) -> list:
+        return [self.shares, self.cost_tok, self.cost_eth, self.withdrawn_tok, self.withdrawn_eth,
+                self.fees_tok, self.fees_eth, self.debt_tok, self.debt_eth]
+
+    @classmethod
+    def from_json(cls, values: list) -> 'Provider':
+        provider = cls()
+        (provider.shares, provider.cost_tok, provider.cost_eth, provider.withdrawn_tok, provider.withdrawn_eth,
+         provider.fees_tok, provider.fees_eth, provider.debt_tok, provider.debt_eth) = values
+        return provider
+
+
+class LPTracker:
+    def __init__(self) -> None:
+        self.providers: Dict[str, Provider] = {}
+        self.supply = 0
+        self.acc_tok = 0  # Token fees per share, times SCALE
+        self.acc_eth = 0  # ETH fees per share, times SCALE
+        self.cursor: Tuple[int, int] = (-1, -1)  # (block, log index) of the last processed log
+
+    def provider(self, address: str) -> Provider:
+        provider = self.providers.get(address)
+        if provider is None:
+            provider = self.providers[address] = Provider()
+        return provider
+
+    # Credit `provider` with the fees accrued since its last settlement. Must be called before its shares change.
+    def settle(self, provider: Provider) -> None:
+        owed_tok = provider.shares * self.acc_tok // SCALE
+        owed_eth = provider.shares * self.acc_eth // SCALE
+        provider.fees_tok += owed_tok - provider.debt_tok
+        provider.fees_eth += owed_eth - provider.debt_eth
+        provider.debt_tok, provider.debt_eth = owed_tok, owed_eth
+
+    def _reset_debt(self, provider: Provider) -> None:
+        provider.debt_tok = provider.shares * self.acc_tok // SCALE
+        provider.debt_eth = provider.shares * self.acc_eth // SCALE
+
+    def on_fee(self, eth_fee: int, tok_fee: int) -> None:
+        if self.supply > 0:
+            self.acc_tok += tok_fee * SCALE // self.supply
+            self.acc_eth += eth_fee * SCALE // self.supply
+
+    def on_mint(self, to: str, shares: int, num_tok: int, num_eth: int) -> None:
+        provider = self.provider(to)
+        self.settle(provider)
+        provider.shares += shares
+        provider.cost_tok += num_tok
+        provider.cost_eth += num_eth
+        self.supply += shares
+        self._reset_debt(provider)
+
+    def on_burn(self, owner: str, shares: int, num_tok: int, num_eth: int) -> None:
+        provider = self.provider(owner)
+        self.settle(provider)
+        self._move_cost(provider, None, shares)
+        provider.shares -= shares
+        provider.withdrawn_tok += num_tok
+        provider.withdrawn_eth += num_eth
+        self.supply -= shares
+        self._reset_debt(provider)
+
+    def on_transfer(self, src: str, dst: str, shares: int) -> None:
+        if src == dst or shares == 0:
+            return
+        sender, receiver = self.provider(src), self.provider(dst)
+        self.settle(sender)
+        self.settle(receiver)
+        self._move_cost(sender, receiver, shares)
+        sender.shares -= shares
+        receiver.shares += shares
+        self._reset_debt(sender)
+        self._reset_debt(receiver)
+
+    # Move the cost basis of `shares` of `src`'s shares to `dst` (or drop it if `dst` is None).
+    def _move_cost(self, src: Provider, dst: Optional[Provider], shares: int) -> None:
+        if src.shares == 0:
+            return
+        tok = src.cost_tok * shares // src.shares
+        eth = src.cost_eth * shares // src.shares
+        src.cost_tok -= tok
+        src.cost_eth -= eth
+        if dst is not None:
+            dst.cost_tok += tok
+            dst.cost_eth += eth
+
+    # Process the exchange events of one transaction, as (event name, arguments) pairs in log order.
+    # A mint or burn emits a liquidity-token `Transfer` from or to the zero address together with a
+    # `MintBurnDetails`, in either order, so they are matched up within the transaction. `initialize`
+    # mints without a `MintBurnDetails`; `initial` gives its (initialTOK, initialETH) deposit.
+    def process_transaction(self, events: Iterable[Tuple[str, dict]], initial: Tuple[int, int] = (0, 0)) -> None:
+        details: List[dict] = []
+        supply_changes: List[dict] = []
+        for name, args in events:
+            if name == 'FeeDetails':
+                self.on_fee(args['actualEthFee'], args['actualTokenFee'])
+            elif name == 'MintBurnDetails':
+                details.append(args)
+            elif name == 'Transfer':
+                if args['from'] == ZERO_ADDRESS or args['to'] == ZERO_ADDRESS:
+                    supply_changes.append(args)
+                else:
+                    self.on_transfer(args['from'], args['to'], args['value'])
+        for i, args in enumerate(supply_changes):
+            amounts = details[i] if i < len(details) else {'numTOK': initial[0], 'numETH': initial[1]}
+            if args['from'] == ZERO_ADDRESS:
+                self.on_mint(args['to'], args['value'], amounts['numTOK'], amounts['numETH'])
+            else:
+                self.on_burn(args['from'], args['value'], amounts['numTOK'], amounts['numETH'])
+
+    def position(self, address: str) -> dict:
+        provider = self.providers.get(address) or Provider()
+        self.settle(provider)
+        return {
+            'shares': provider.shares,
+            'share_of_pool': provider.shares / self.supply if self.supply else 0.0,
+            'cost_tok': provider.cost_tok,
+            'cost_eth': provider.cost_eth,
+            'withdrawn_tok': provider.withdrawn_tok,
+            'withdrawn_eth': provider.withdrawn_eth,
+            'fees_tok': provider.fees_tok,
+            'fees_eth': provider.fees_eth,
+        }
+
+    # Write the state to `path` atomically (see scripts/checkpoint.py).
+    def save(self, path: str) -> None:
+        state = {
+            'cursor': list(self.cursor),
+            'supply': self.supply,
+            'acc_tok': self.acc_tok,
+            'acc_eth': self.acc_eth,
+            'providers': {address: p.to_json() for address, p in self.providers.items()},
+        }
+        save_json(path, state)
+
+    # Load a checkpoint written by `save`, or start from scratch if there is none.
+    @classmethod
+    def load(cls, path: str) -> 'LPTracker':
+        tracker = cls()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            tracker.cursor = tuple(state['cursor'])
+            tracker.supply = state['supply']
+            tracker.acc_tok = state['acc_tok']
+            tracker.acc_eth = state['acc_eth']
+            tracker.providers = {address: Provider.from_json(p) for address, p in state['providers'].items()}
+        return tracker
+
+    # Process ape `ContractLog`s sorted by (block, log index), skipping logs at or before the cursor.
+    # The deposit of `initialize` is only in its calldata, which is decoded with `exch` if given.
+    def process_logs(self, logs, exch=None) -> None:
+        logs = [log for log in logs if (log.block_number, log.log_index) > self.cursor]
+        for txn_hash, txn_logs in groupby(logs, key=lambda log: log.transaction_hash):
+            txn_logs = list(txn_logs)
+            events = [(log.event_name, log.event_arguments) for log in txn_logs]
+            initial = (0, 0)
+            if exch is not None and _initializes(events):
+                initial = initialize_deposit(exch, txn_hash) or initial
+            self.process_transaction(events, initial)
+            self.cursor = (txn_logs[-1].block_number, txn_logs[-1].log_index)
+
+
+def _initializes(events: List[Tuple[str, dict]]) -> bool:
+    return any(name == 'Transfer' and args['from'] == ZERO_ADDRESS for name, args in events) and \
+        not any(name == 'MintBurnDetails' for name, _ in events)
+
+
+# The (initialTOK, initialETH) deposited by transaction `txn_hash`, if it is a call to `exch.initialize`.
+def initialize_deposit(exch, txn_hash) -> Optional[Tuple[int, int]]:
+    from ape import chain
+
+    receipt = chain.provider.get_receipt(txn_hash)
+    try:
+        method, args = exch.decode_input(receipt.transaction.data)
+    except Exception:
+        return None  # Not a direct call to the exchange
+    if not method.startswith('initialize('):
+        return None
+    args = list(args.values())
+    return (args[2], args[3])
+
+
+# Catch `tracker` up with the exchange's logs up to `stop_block` (default: the chain head),
+# `batch_blocks` blocks at a time, checkpointing after every batch if `checkpoint_path` is given.
+def follow(exch, tracker: LPTracker, stop_block: Optional[int] = None, batch_blocks: int = 1000,
+           checkpoint_path: Optional[str] = None) -> None:
+    from ape import chain
+
+    if stop_block is None:
+        stop_block = chain.blocks.head.number
+    start = max(tracker.cursor[0], 0)
+    while start <= stop_block:
+        stop = min(start + batch_blocks, stop_block + 1)
+        logs = list(exch.Transfer.range(start, stop))
+        logs += exch.MintBurnDetails.range(start, stop)
+        logs += exch.FeeDetails.range(start, stop)
+        logs.sort(key=lambda log: (log.block_number, log.log_index))
+        tracker.process_logs(logs, exch)
+        # Every log up to `stop` has been seen, so a restart can skip these blocks entirely.
+        tracker.cursor = max(tracker.cursor, (stop - 1, 2 ** 63))
+        if checkpoint_path is not None:
+            tracker.save(checkpoint_path)
+        start = stop
@@ -0,0 +1,299 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, Iterable, Optional, Tuple
+import os
+import time
+
+# Client-side metrics for RUToken/RUExchange contract calls and transactions.
+#
+#     registry = MetricsRegistry(enabled=True)
+#     tok = instrument(project.RUToken.at(addr), registry)
+#     tok.transfer(dst, 100, sender=acct)  # Recorded
+#     registry.write_textfile('/var/lib/node_exporter/ru.prom')
+#
+# `instrument` returns the contract itself when the registry is disabled, so instrumented code paths
+# cost nothing unless metrics are turned on (by default, with the RU_METRICS environment variable).
+# Note that an instrumented contract is a wrapper: pass `.address` when using it as a call argument.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUEUE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+GAS_BUCKETS = (25_000, 50_000, 75_000, 100_000, 150_000, 200_000, 300_000, 500_000, 1_000_000, 3_000_000)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    labels = ['{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+              for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield '# HELP {} {}'.format(self.name, self.help)
+        yield '# TYPE {} counter'.format(self.name)
+        for labels, value in sorted(self.values.items()):
+            yield '{}{} {}'.format(self.name, _format_labels(self.labels, labels), _format_value(value))
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def render(self) -> Iterable[str]:
+        yield '# HELP {} {}'.format(self.name, self.help)
+        yield '# TYPE {} gauge'.format(self.name)
+        for labels, value in sorted(self.values.items()):
+            yield '{}{} {}'.format(self.name, _format_labels(self.labels, labels), _format_value(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # Per label set: [count per bucket (not cumulative), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * len(self.buckets), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield '# HELP {} {}'.format(self.name, self.help)
+        yield '# TYPE {} histogram'.format(self.name)
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                yield '{}_bucket{} {}'.format(self.name, _format_labels(self.labels, labels, le), cumulative)
+            yield '{}_sum{} {}'.format(self.name, _format_labels(self.labels, labels), _format_value(total))
+            yield '{}_count{} {}'.format(self.name, _format_labels(self.labels, labels), cumulative)
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: Optional[bool] = None) -> None:
+        self.enabled = bool(os.environ.get('RU_METRICS')) if enabled is None else enabled
+        self.lock = Lock()
+        self.calls = Counter('ru_contract_calls_total', 'Contract method invocations.', ('contract', 'method', 'kind'))
+        self.reverts = Counter('ru_contract_reverts_total', 'Contract method invocations that reverted.', ('contract', 'method', 'kind'))
+        self.latency = Histogram('ru_contract_latency_seconds', 'Contract method latency, including waiting for the receipt.',
+                                 ('contract', 'method', 'kind'))
+        self.signing = Histogram('ru_signing_seconds', 'Time spent signing transactions.', ('contract', 'method'))
+        self.gas = Histogram('ru_gas_used', 'Gas used by transactions.', ('contract', 'method'), GAS_BUCKETS)
+        self.rpc_requests = Counter('ru_rpc_requests_total', 'JSON-RPC requests sent to the node.', ('rpc_method',))
+        self.rpc_errors = Counter('ru_rpc_errors_total', 'JSON-RPC requests that failed.', ('rpc_method',))
+        self.rpc_latency = Histogram('ru_rpc_latency_seconds', 'JSON-RPC request latency.', ('rpc_method',))
+        self.cosign_depth = Gauge('ru_cosign_queue_depth', 'Co-signing proposals by status.', ('status',))
+        self.cosign_latency = Histogram('ru_cosign_latency_seconds', 'Time from proposal to each co-signing stage.',
+                                        ('stage',), QUEUE_BUCKETS)
+        self.cosign_errors = Counter('ru_cosign_errors_total', 'Co-signing rounds that failed and were retried.', ('stage',))
+        self.metrics = [self.calls, self.reverts, self.latency, self.signing, self.gas, self.rpc_requests,
+                        self.rpc_errors, self.rpc_latency, self.cosign_depth, self.cosign_latency, self.cosign_errors]
+
+    def render(self) -> str:
+        with self.lock:
+            return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
+
+    # Write the metrics for the node_exporter textfile collector. The file is replaced atomically.
+    def write_textfile(self, path: str) -> None:
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    # Serve the metrics over HTTP (any path) from a daemon thread. Returns the server so it can be shut down.
+    def serve(self, port: int = 9100, addr: str = '127.0.0.1') -> ThreadingHTTPServer:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+default_registry = MetricsRegistry()
+
+
+def _is_revert(err: Exception) -> bool:
+    from ape.exceptions import ContractLogicError
+    return isinstance(err, ContractLogicError)
+
+
+def _uses_account_call(sender) -> bool:
+    from ape.api import AccountAPI
+    return getattr(type(sender), 'call', None) is AccountAPI.call
+
+
+class _InstrumentedCall:
+    def __init__(self, handler, contract: str, method: str, registry: MetricsRegistry) -> None:
+        self.handler = handler
+        self.labels = (contract, method, 'call')
+        self.registry = registry
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.handler(*args, **kwargs)
+        except Exception as err:
+            if _is_revert(err):
+                with self.registry.lock:
+                    self.registry.reverts.inc(*self.labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.registry.lock:
+                self.registry.calls.inc(*self.labels)
+                self.registry.latency.observe(elapsed, *self.labels)
+
+
+class _InstrumentedTransaction(_InstrumentedCall):
+    def __init__(self, handler, contract: str, method: str, registry: MetricsRegistry) -> None:
+        super().__init__(handler, contract, method, registry)
+        self.labels = (contract, method, 'transaction')
+
+    # Mirrors `AccountAPI.call` so that signing can be timed separately from the rest of the round trip. As
+    # in ape, every keyword argument other than `send_everything` and `private` is also given to the signer.
+    # Accounts that override `call` (e.g. impersonated accounts, which send without signing) are left to it.
+    def __call__(self, *args, **kwargs):
+        sender = kwargs.get('sender')
+        if not _uses_account_call(sender):
+            return super().__call__(*args, **kwargs)
+        from ape.exceptions import AccountsError, SignatureError, TransactionError
+
+        registry = self.registry
+        start = time.perf_counter()
+        signing = None  # Only set once the transaction was signed
+        receipt = None
+        try:
+            txn = sender.prepare_transaction(self.handler.as_transaction(*args, **kwargs))
+            signer_options = dict(kwargs)
+            send_everything = signer_options.pop('send_everything', False)
+            private = signer_options.pop('private', False)
+            if not isinstance(txn.gas_limit, int) or txn.max_fee is None:
+                raise TransactionError('Transaction not prepared.')
+            if send_everything:
+                total_fees = txn.max_fee * txn.gas_limit
+                value = sender.balance - total_fees
+                if value <= 0:
+                    raise AccountsError(
+                        'Sender does not have enough to cover transaction value and gas: {}'.format(total_fees))
+                txn.value = value
+
+            sign_start = time.perf_counter()
+            signed = sender.sign_transaction(txn, **signer_options)
+            if not signed:
+                raise SignatureError('The transaction was not signed.')
+            signing = time.perf_counter() - sign_start
+            if not txn.sender:
+                txn.sender = sender.address
+
+            provider = self.handler.provider
+            receipt = provider.send_private_transaction(signed) if private else provider.send_transaction(signed)
+            return receipt
+        except Exception as err:
+            if _is_revert(err):
+                with registry.lock:
+                    registry.reverts.inc(*self.labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with registry.lock:
+                registry.calls.inc(*self.labels)
+                registry.latency.observe(elapsed, *self.labels)
+                if signing is not None:
+                    registry.signing.observe(signing, *self.labels[:2])
+                if receipt is not None:
+                    registry.gas.observe(receipt.gas_used, *self.labels[:2])
+
+
+class InstrumentedContract:
+    def __init__(self, contract, registry: MetricsRegistry) -> None:
+        self.contract = contract
+        self.registry = registry
+        self.name = contract.contract_type.name
+        self.handlers = {}
+
+    def __getattr__(self, name):
+        from ape.contracts.base import ContractCallHandler, ContractTransactionHandler
+
+        handler = self.handlers.get(name)
+        if handler is None:
+            attr = getattr(self.contract, name)
+            if isinstance(attr, ContractTransactionHandler):
+                handler = _InstrumentedTransaction(attr, self.name, name, self.registry)
+            elif isinstance(attr, ContractCallHandler):
+                handler = _InstrumentedCall(attr, self.name, name, self.registry)
+            else:
+                return attr
+            self.handlers[name] = handler
+        return handler
+
+
+def instrument(contract, registry: MetricsRegistry = default_registry):
+    if not registry.enabled:
+        return contract
+    return InstrumentedContract(contract, registry)
+
+
+# Count and time every JSON-RPC request sent through `web3` (e.g. `chain.provider.web3`).
+def instrument_web3(web3, registry: MetricsRegistry = default_registry) -> None:
+    if not registry.enabled:
+        return
+    manager = web3.manager
+    request_blocking = manager.request_blocking
+
+    def timed_request_blocking(method, params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return request_blocking(method, params, *args, **kwargs)
+        except Exception:
+            with registry.lock:
+                registry.rpc_errors.inc(str(method))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with registry.lock:
+                registry.rpc_requests.inc(str(method))
+                registry.rpc_latency.observe(elapsed, str(method))
+
+    manager.request_blocking = timed_request_blocking
@@ -29,3 +29,21 @@ def generate_nonce_and_second_signature_transfer2of3(tok: RUToken, sk, multisigA
     # TODO: Implement
     return (0, Signature(b'\0', b'\0', 0)) # Change this!
 
+
+# The co-signing coordinator (`scripts/cosign.py`) signs several transfers from the same multisig address
+# ahead of time, before any of them is executed. It assumes that consecutive transfers use consecutive nonces
+# (the k-th transfer after the next one uses the next nonce plus k), and needs these two functions.
+
+# This function should return the nonce of the next transfer2of3 from `multisigAddr`.
+# Note: The function should *not* change state in any way.
+def next_nonce_transfer2of3(tok: RUToken, multisigAddr) -> int:
+    # TODO: Implement
+    return 0 # Change this!
+
+
+# This function should return the signature for a transfer2of3 with the given `nonce`.
+def sign_transfer2of3(tok: RUToken, sk, multisigAddr, spender, amount, nonce) -> Signature:
+    key = keys.PrivateKey(bytes.fromhex(sk[2:])) # Can be used with `keys.ecdsa_sign``
+
+    # TODO: Implement
+    return Signature(b'\0', b'\0', 0) # Change this!
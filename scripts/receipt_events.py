@@ -0,0 +1,233 @@
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+import os
+import time
+
+from eth_utils import encode_hex, keccak, to_checksum_address
+
+# Lazy, topic-indexed event lookup for transaction receipts.
+#
+# `receipt.events` decodes every log in the receipt before anything can be matched by name. `ReceiptEvents`
+# instead indexes the raw logs by topic0 (the hash of the event signature), and only decodes the logs of
+# the event type that is asked for, once, with a decoder that is built once per event ABI.
+#
+#     events = ReceiptEvents(tx)
+#     fee = events.find('FeeDetails')
+#     transfers = events.filter('Transfer', address=tok.address)
+#
+# `events_for(tx)` returns the same `ReceiptEvents` for repeated lookups on a recent receipt. Events are
+# `DecodedEvent`s, which have the attributes of ape's `ContractLog` (`event_name`, `event_arguments`,
+# `contract_address`, `log_index`, `transaction_hash`, `transaction_index`, `block_number`, `block_hash`)
+# and the event's arguments as attributes and items, but none of its methods.
+
+
+class DecodedEvent:
+    def __init__(self, event_name: str, contract_address: str, log_index: int, event_arguments: dict,
+                 transaction_hash: Optional[str] = None, transaction_index: Optional[int] = None,
+                 block_number: Optional[int] = None, block_hash: Optional[str] = None) -> None:
+        self.event_name = event_name
+        self.contract_address = contract_address
+        self.log_index = log_index
+        self.event_arguments = event_arguments
+        self.transaction_hash = transaction_hash
+        self.transaction_index = transaction_index
+        self.block_number = block_number
+        self.block_hash = block_hash
+
+    def get(self, name: str, default=None):
+        return self.event_arguments.get(name, default)
+
+    def __getitem__(self, name: str):
+        return self.event_arguments[name]
+
+    def __getattr__(self, name: str):
+        try:
+            return self.__dict__['event_arguments'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        return '<{} {}>'.format(self.event_name, self.event_arguments)
+
+
+class EventIndex:
+    # Maps event names to the ABIs (and topic0 hashes) of every event of that name in `contract_types`.
+    def __init__(self, contract_types: Iterable) -> None:
+        self.by_name: Dict[str, Dict[bytes, object]] = defaultdict(dict)
+        for contract_type in contract_types:
+            for abi in contract_type.events:
+                if not abi.anonymous:
+                    self.by_name[abi.name][keccak(text=abi.selector)] = abi
+
+    def topics(self, name: str) -> Dict[bytes, object]:
+        return self.by_name.get(name, {})
+
+
+@lru_cache(maxsize=None)
+def project_event_index() -> EventIndex:
+    from ape import project
+    return EventIndex(project.contracts.values())
+
+
+_decoders: Dict[bytes, Callable[[List[str], bytes], dict]] = {}
+
+
+# Returns a decoder for the logs with topic0 `topic`, built once per event type.
+def _decoder(topic: bytes, abi) -> Callable[[List[str], bytes], dict]:
+    decode = _decoders.get(topic)
+    if decode is None:
+        decode = _decoders[topic] = _make_decoder(abi)
+    return decode
+
+
+def _make_decoder(abi) -> Callable[[List[str], bytes], dict]:
+    from ape.utils.abi import LogInputABICollection
+
+    collection = LogInputABICollection(abi)
+    addresses = [i.name for i in abi.inputs if i.type == 'address']
+
+    def decode(topics: List[str], data: bytes) -> dict:
+        args = collection.decode(topics, data)
+        for name in addresses:
+            args[name] = to_checksum_address(args[name])
+        return args
+    return decode
+
+
+def _as_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value.removeprefix('0x'))
+    return bytes(value)
+
+
+# ape's log decoder expects hex-string topics (`eth_utils.decode_hex` rejects bytes before eth-utils 3).
+def _as_hex(value) -> str:
+    return value if isinstance(value, str) else encode_hex(bytes(value))
+
+
+def _as_int(value) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value or 0)
+
+
+def _field(log: dict, key: str, default, convert):
+    value = log.get(key)
+    return default if value is None else convert(value)
+
+
+class ReceiptEvents:
+    def __init__(self, receipt, index: Optional[EventIndex] = None) -> None:
+        self.index = index or project_event_index()
+        self.transaction_hash = getattr(receipt, 'txn_hash', None)
+        self.block_number = getattr(receipt, 'block_number', None)
+        self.logs_by_topic: Dict[bytes, List[dict]] = defaultdict(list)
+        for log in receipt.logs:
+            topics = log['topics']
+            if topics:
+                self.logs_by_topic[_as_bytes(topics[0])].append(log)
+        self.decoded: Dict[str, List[DecodedEvent]] = {}
+
+    # All events named `name`, in log order, optionally only those emitted by `address`.
+    def filter(self, name: str, address: Optional[str] = None) -> List[DecodedEvent]:
+        events = self.decoded.get(name)
+        if events is None:
+            events = []
+            for topic, abi in self.index.topics(name).items():
+                decoder = _decoder(topic, abi)
+                for log in self.logs_by_topic.get(topic, ()):
+                    topics = [_as_hex(t) for t in log['topics']]
+                    args = decoder(topics, _as_bytes(log['data']))
+                    events.append(DecodedEvent(
+                        name, to_checksum_address(log['address']), _as_int(log.get('logIndex')), args,
+                        _field(log, 'transactionHash', self.transaction_hash, _as_hex),
+                        _field(log, 'transactionIndex', None, _as_int),
+                        _field(log, 'blockNumber', self.block_number, _as_int),
+                        _field(log, 'blockHash', None, _as_hex)))
+            events.sort(key=lambda event: event.log_index)
+            self.decoded[name] = events
+        if address is not None:
+            address = to_checksum_address(address)
+            return [event for event in events if event.contract_address == address]
+        return events
+
+    # The first event named `name` (optionally emitted by `address`), or None.
+    def find(self, name: str, address: Optional[str] = None) -> Optional[DecodedEvent]:
+        events = self.filter(name, address)
+        return events[0] if events else None
+
+
+_recent: 'OrderedDict[tuple, ReceiptEvents]' = OrderedDict()
+RECENT_RECEIPTS = 256
+
+
+# The `ReceiptEvents` of `receipt`, shared by lookups on the same receipt while it is among the most recent
+# ones. Receipts are keyed by transaction hash and block, since a reverted chain can include the same
+# transaction again in another block.
+def events_for(receipt) -> ReceiptEvents:
+    key = (getattr(receipt, 'txn_hash', None), getattr(receipt, 'block_number', None))
+    if key[0] is None:
+        return ReceiptEvents(receipt)
+    events = _recent.get(key)
+    if events is None:
+        events = _recent[key] = ReceiptEvents(receipt)
+        if len(_recent) > RECENT_RECEIPTS:
+            _recent.popitem(last=False)
+    else:
+        _recent.move_to_end(key)
+    return events
+
+
+class ReceiptBatch:
+    # Index many receipts at once; decoders are shared between them.
+    def __init__(self, receipts: Iterable, index: Optional[EventIndex] = None) -> None:
+        self.receipts = [ReceiptEvents(receipt, index) for receipt in receipts]
+
+    def __len__(self) -> int:
+        return len(self.receipts)
+
+    def __getitem__(self, i: int) -> ReceiptEvents:
+        return self.receipts[i]
+
+    # All events named `name` across the receipts, in receipt order.
+    def filter(self, name: str, address: Optional[str] = None) -> List[DecodedEvent]:
+        return [event for receipt in self.receipts for event in receipt.filter(name, address)]
+
+
+def benchmark(receipts: list, names=('Transfer', 'FeeDetails', 'MintBurnDetails'), repeat: int = 5) -> dict:
+    def scan(tx, name):
+        for event in tx.events:
+            if event.event_name == name:
+                return event
+        return None
+
+    project_event_index()  # Built once per process; not part of either measurement.
+    timings = {}
+    for label, run in (('find_event', lambda: [scan(tx, name) for tx in receipts for name in names]),
+                       ('ReceiptEvents', lambda: [events.find(name) for events in ReceiptBatch(receipts).receipts
+                                                  for name in names])):
+        best = float('inf')
+        for _ in range(repeat):
+            for tx in receipts:
+                tx.__dict__.pop('events', None)  # Don't let a cached decode skew the scan.
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        timings[label] = best
+    return timings
+
+
+# `ape run receipt_events` benchmarks the receipts of the transactions listed (comma-separated) in
+# $RECEIPTS, or the receipts of the workload in scripts/workload.py.
+def main():
+    from ape import accounts, chain
+    from scripts.workload import run_workload
+
+    if os.environ.get('RECEIPTS'):
+        receipts = [chain.provider.get_receipt(h.strip()) for h in os.environ['RECEIPTS'].split(',')]
+    else:
+        receipts = [receipt for _, receipt in run_workload(accounts.test_accounts)]
+    logs = sum(len(tx.logs) for tx in receipts)
+    timings = benchmark(receipts)
+    print('{} receipts, {} logs'.format(len(receipts), logs))
+    for label, seconds in timings.items():
+        print('{:14} {:8.2f}ms'.format(label, seconds * 1000))
@@ -0,0 +1,96 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Time-weighted average prices from the RUExchange price accumulator (`getPriceCumulative`).
+#
+# The exchange adds `price * seconds` to the accumulator, with the price of a token in ETH as a UQ112x112
+# number, whenever its reserves change. Two observations of the accumulator therefore give the average
+# price over any window between them, without replaying the reserve history:
+#
+#     start = observe(exch)
+#     ...
+#     price = twap(start, observe(exch))  # ETH per token
+#
+# `ape run twap` measures the gas the accumulator adds to buyTokens and sellTokens, against
+# RUExchangeWithoutTWAP, which is the same exchange with the accumulator hook removed.
+
+Q112 = 2 ** 112
+CUMULATIVE_MOD = 2 ** 224
+TIMESTAMP_MOD = 2 ** 32
+
+
+class Observation(NamedTuple):
+    cumulative: int
+    timestamp: int
+
+
+def encode_price(tok_reserve: int, eth_reserve: int) -> int:
+    return (eth_reserve * Q112) // tok_reserve
+
+
+# Extend the accumulator from its last update (`cumulative`, `last_timestamp`) to `timestamp`, at
+# the price given by the current reserves, which held since the last update.
+def extend(cumulative: int, last_timestamp: int, timestamp: int, tok_reserve: int, eth_reserve: int) -> Observation:
+    elapsed = (timestamp - last_timestamp) % TIMESTAMP_MOD
+    if elapsed and tok_reserve:
+        cumulative = (cumulative + encode_price(tok_reserve, eth_reserve) * elapsed) % CUMULATIVE_MOD
+    return Observation(cumulative, timestamp % TIMESTAMP_MOD)
+
+
+# Average price of a token in ETH between two observations (`start` must be the older one).
+def twap(start: Observation, end: Observation) -> float:
+    elapsed = (end.timestamp - start.timestamp) % TIMESTAMP_MOD
+    if elapsed == 0:
+        raise ValueError('observations are from the same timestamp')
+    return ((end.cumulative - start.cumulative) % CUMULATIVE_MOD) / elapsed / Q112
+
+
+# Observe the accumulator of `exch` as of `block_id` (default: the latest block). The stored value is
+# only updated when the reserves change, so it is extended to the block's timestamp using the current
+# reserves, which is exactly what the exchange would accumulate on its next update.
+def observe(exch, block_id: Optional[int] = None) -> Observation:
+    from ape import chain
+
+    block = chain.blocks.head if block_id is None else chain.blocks[block_id]
+    cumulative, last_timestamp = exch.getPriceCumulative(block_id=block.number)
+    tok_reserve = exch.tokenBalance(block_id=block.number)
+    eth_reserve = chain.provider.get_balance(exch.address, block_id=block.number)
+    return extend(cumulative, last_timestamp, block.timestamp, tok_reserve, eth_reserve)
+
+
+# Gas used by `swaps` rounds of buyTokens then sellTokens on each exchange contract, from identical
+# states and with a minute between transactions, so every swap accumulates.
+def measure_overhead(accounts, swaps: int = 5) -> Dict[str, Tuple[List[int], List[int]]]:
+    from ape import chain, project
+    from tests.test_exchange import initialize_ru_exchange
+    from tests.test_tokens import deploy_ru_token
+
+    a1, a2 = accounts[0:2]
+    gas = {}
+    for container in (project.RUExchange, project.RUExchangeWithoutTWAP):
+        tok = deploy_ru_token(project.RUToken, 100, int(1e15), a1)
+        exch = container.deploy(sender=a1)
+        initialize_ru_exchange(exch, tok, a1, 5, 1000, 2000)
+        tok.approve(exch, 5 * swaps, sender=a2)
+        buys, sells = [], []
+        for _ in range(swaps):
+            chain.mine(deltatime=60)
+            buys.append(exch.buyTokens(10, int(1e7), sender=a2, value=int(1e7)).gas_used)
+            chain.mine(deltatime=60)
+            sells.append(exch.sellTokens(5, 0, sender=a2).gas_used)
+        gas[container.contract_type.name] = (buys, sells)
+    return gas
+
+
+def main():
+    from ape import accounts
+    from scripts.exchange import grade_exchange
+
+    if not grade_exchange:
+        print('The exchange is not implemented (scripts/exchange.py: grade_exchange), nothing to measure')
+        return
+    gas = measure_overhead(accounts.test_accounts)
+    print('{:12} {:>14} {:>14} {:>10}'.format('', 'RUExchange', 'without TWAP', 'overhead'))
+    for i, function in enumerate(('buyTokens', 'sellTokens')):
+        with_twap = sum(gas['RUExchange'][i]) // len(gas['RUExchange'][i])
+        without = sum(gas['RUExchangeWithoutTWAP'][i]) // len(gas['RUExchangeWithoutTWAP'][i])
+        print('{:12} {:>14} {:>14} {:>10}'.format(function, with_twap, without, with_twap - without))
@@ -0,0 +1,54 @@
+from typing import Callable, List, Tuple
+
+# The operations exercised by the test suite, as run by the profiling scripts (`gas_profiler`,
+# `access_list`, `receipt_events`) on freshly deployed contracts.
+#
+#     receipts = [receipt for label, receipt in run_workload(accounts)]
+#
+# Each operation is sent through a hook with the arguments of `send_operation`, so a script can
+# measure it before sending it, or send it differently (e.g., with an access list).
+
+
+def send_operation(label: str, contract, method: str, *args, **kwargs):
+    return getattr(contract, method)(*args, **kwargs)
+
+
+# Returns (label, receipt) for every transaction sent, in order. Setup transactions (minting,
+# registering the multisig address, funding it, initializing the exchange) are sent directly; only the
+# operations go through `operation`, which must return the receipt.
+def run_workload(accounts, operation: Callable = send_operation) -> List[Tuple[str, object]]:
+    from ape import project
+    from scripts.exchange import grade_exchange
+    from scripts.multisig_token import grade_multisig, generate_nonce_and_second_signature_transfer2of3
+    from tests.test_tokens import deploy_ru_token, mint_ru_tokens
+
+    a1, a2, a3, a4 = accounts[0:4]
+    tok = deploy_ru_token(project.RUToken, 100, int(1e15), a1)
+    receipts = [('mint', mint_ru_tokens(tok, a1, 1000))]
+
+    def run(label, contract, method, *args, **kwargs):
+        receipts.append((label, operation(label, contract, method, *args, **kwargs)))
+
+    run('transfer', tok, 'transfer', a2, 100, sender=a1)
+    run('approve', tok, 'approve', a3, 100, sender=a2)
+    run('transferFrom', tok, 'transferFrom', a2, a3, 50, sender=a3)
+    run('burn', tok, 'burn', 10, sender=a1)
+
+    if grade_multisig:
+        receipts.append(('registerMultisigAddress', tok.registerMultisigAddress(a2, a3, a4, sender=a2)))
+        multisig = tok.getMultisigAddress(a2, a3, a4)
+        receipts.append(('fund multisig', tok.transfer(multisig, 100, sender=a1)))
+        nonce, sig = generate_nonce_and_second_signature_transfer2of3(tok, a3.private_key, multisig, a1, 10)
+        run('transfer2of3', tok, 'transfer2of3', multisig, a1, 10, nonce, sig.encoded(), sender=a2)
+
+    if grade_exchange:
+        from tests.test_exchange import deploy_ru_exchange, initialize_ru_exchange
+
+        exch = deploy_ru_exchange(a1)
+        receipts.append(('initialize', initialize_ru_exchange(exch, tok, a1, 5, 1000, 2000)))
+        receipts.append(('approve exchange', tok.approve(exch, 100, sender=a2)))
+        run('buyTokens', exch, 'buyTokens', 10, int(1e7), sender=a2, value=int(1e7))
+        run('sellTokens', exch, 'sellTokens', 10, 0, sender=a2)
+        run('mintLiquidityTokens', exch, 'mintLiquidityTokens', 10, int(1e6), int(1e6), sender=a2, value=int(1e6))
+        run('burnLiquidityTokens', exch, 'burnLiquidityTokens', 10, 0, 0, sender=a2)
+    return receipts
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+# Optional per-test phase profiling, enabled with `--phase-profile=DIR`. `pytester` runs the profiler's own tests.
+pytest_plugins = ['tests.phase_profiler', 'pytester']
+
+
+# With RU_CLONE_DEPLOY=1 (see tests/test_tokens.py), deploy the factory tokens and exchanges are cloned from
+# once per session. Ape takes the snapshots tests are reverted to after session fixtures run, so it survives
+# isolation instead of being deployed again by every test.
+@pytest.fixture(scope='session', autouse=True)
+def ru_factory(request):
+    if os.environ.get('RU_CLONE_DEPLOY') != '1':
+        return None
+    from scripts.factory import cached_factory
+
+    return cached_factory(request.getfixturevalue('accounts')[0])
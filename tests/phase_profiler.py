@@ -0,0 +1,212 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+import functools
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Pytest plugin that breaks the time of every test down by phase.
+#
+#     ape test --phase-profile=profile/
+#
+# Phases nest (an RPC request inside a deployment inside a test's call), and each phase is charged only
+# its own time, without the phases nested in it:
+#  * setup / call / teardown --- pytest's test phases (`hypothesis` instead of `call` for Hypothesis
+#                                tests, where it is the time spent generating and shrinking inputs).
+#  * example                 --- running one Hypothesis example.
+#  * compile                 --- compiling contracts.
+#  * deploy                  --- deploying contracts.
+#  * funding                 --- minting, initializing and transferring ETH to set tests up.
+#  * rpc                     --- waiting for requests to the node. Each request is also attributed to the
+#                                innermost function of the test suite that made it.
+#
+# Results (in the given directory):
+#  * `phases.tsv`      --- seconds per test and phase, slowest test first.
+#  * `rpc_callers.tsv` --- RPC requests and seconds per test-suite function, busiest first.
+#  * `trace.json`      --- Chrome trace (chrome://tracing or https://ui.perfetto.dev) of all phases.
+
+HELPER_PHASES = {
+    'deploy_ru_token': 'deploy',
+    'deploy_ru_exchange': 'deploy',
+    'mint_ru_tokens': 'funding',
+    'initialize_ru_exchange': 'funding',
+    'deploy_and_mint': 'funding',
+    'register_multisigs': 'funding',
+}
+
+PHASES = ('setup', 'call', 'hypothesis', 'example', 'teardown', 'compile', 'deploy', 'funding', 'rpc')
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.test = '<session>'
+        self.stack = []  # [name, start, time of nested phases]
+        self.times = defaultdict(lambda: defaultdict(float))
+        self.rpc_callers = defaultdict(lambda: [0, 0.0])
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def begin(self, name: str) -> None:
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def end(self) -> float:
+        name, start, nested = self.stack.pop()
+        duration = time.perf_counter() - start
+        self.times[self.test][name] += duration - nested
+        if self.stack:
+            self.stack[-1][2] += duration
+        self.events.append({'name': name, 'cat': self.test, 'ph': 'X', 'pid': 0, 'tid': 0,
+                            'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6})
+        return duration
+
+    @contextmanager
+    def phase(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def wrap(self, fn, name: str):
+        if getattr(fn, '_phase_profiled', False):
+            return fn
+
+        @functools.wraps(fn)
+        def profiled(*args, **kwargs):
+            with self.phase(name):
+                return fn(*args, **kwargs)
+        profiled._phase_profiled = True
+        return profiled
+
+    def write(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / 'phases.tsv', 'w') as f:
+            f.write('\t'.join(('test', 'total') + PHASES) + '\n')
+            rows = sorted(self.times.items(), key=lambda kv: -sum(kv[1].values()))
+            for test, times in rows:
+                values = [sum(times.values())] + [times.get(phase, 0.0) for phase in PHASES]
+                f.write(test + '\t' + '\t'.join('{:.6f}'.format(v) for v in values) + '\n')
+        with open(directory / 'rpc_callers.tsv', 'w') as f:
+            f.write('test\tcaller\trequests\tseconds\n')
+            for (test, caller), (count, seconds) in sorted(self.rpc_callers.items(), key=lambda kv: -kv[1][1]):
+                f.write('{}\t{}\t{}\t{:.6f}\n'.format(test, caller, count, seconds))
+        with open(directory / 'trace.json', 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+# The innermost function of the test suite (outside this plugin) on the call stack.
+def _test_suite_caller() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(TESTS_DIR) and filename != __file__:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return '<outside tests>'
+
+
+class PhaseProfiler:
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.recorder = Recorder()
+        self.patched = []
+
+    def patch(self, owner, name: str, replacement) -> None:
+        self.patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def install(self) -> None:
+        from web3.manager import RequestManager
+        from ape.api.accounts import AccountAPI
+        from ape.contracts.base import ContractContainer
+        from ape.managers.compilers import CompilerManager
+
+        recorder = self.recorder
+        request_blocking = RequestManager.request_blocking
+
+        def profiled_request(manager, method, *args, **kwargs):
+            recorder.begin('rpc')
+            try:
+                return request_blocking(manager, method, *args, **kwargs)
+            finally:
+                duration = recorder.end()
+                entry = recorder.rpc_callers[(recorder.test, _test_suite_caller())]
+                entry[0] += 1
+                entry[1] += duration
+
+        self.patch(RequestManager, 'request_blocking', profiled_request)
+        self.patch(CompilerManager, 'compile', recorder.wrap(CompilerManager.compile, 'compile'))
+        self.patch(ContractContainer, 'deploy', recorder.wrap(ContractContainer.deploy, 'deploy'))
+        self.patch(AccountAPI, 'transfer', recorder.wrap(AccountAPI.transfer, 'funding'))
+
+    def uninstall(self) -> None:
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched.clear()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, items):
+        modules = {item.module for item in items if getattr(item, 'module', None) is not None}
+        for module in modules:
+            for name, phase in HELPER_PHASES.items():
+                fn = getattr(module, name, None)
+                if callable(fn):
+                    # Fixtures are wrapped by pytest already; wrapping them again would hide them.
+                    if not hasattr(fn, '_pytestfixturefunction') and not hasattr(fn, '_fixture_function_marker'):
+                        self.patch(module, name, self.recorder.wrap(fn, phase))
+
+    def _run_phase(self, item, name: str):
+        self.recorder.test = item.nodeid
+        self.recorder.begin(name)
+        try:
+            yield
+        finally:
+            self.recorder.end()
+            self.recorder.test = '<session>'
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        yield from self._run_phase(item, 'setup')
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        handle = getattr(item.obj, 'hypothesis', None)
+        inner_test = getattr(handle, 'inner_test', None)
+        if inner_test is None:
+            yield from self._run_phase(item, 'call')
+            return
+        handle.inner_test = self.recorder.wrap(inner_test, 'example')
+        try:
+            yield from self._run_phase(item, 'hypothesis')
+        finally:
+            handle.inner_test = inner_test
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        yield from self._run_phase(item, 'teardown')
+
+    def pytest_sessionfinish(self, session):
+        self.uninstall()
+        self.recorder.write(self.directory)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_sep('-', 'phase profile written to {}'.format(self.directory))
+
+
+def pytest_addoption(parser):
+    parser.addoption('--phase-profile', metavar='DIR', default=None,
+                     help='Write a per-test, per-phase time breakdown and a Chrome trace to DIR.')
+
+
+def pytest_configure(config):
+    directory = config.getoption('--phase-profile')
+    if directory:
+        profiler = PhaseProfiler(Path(directory))
+        profiler.install()
+        config.pluginmanager.register(profiler, 'phase_profiler')
@@ -0,0 +1,41 @@
+from scripts.access_list import AccessListCache, Entry, call_key, _normalize
+
+TOK = '0x' + 'a' * 40
+A = '0x' + '1' * 40
+B = '0x' + '2' * 40
+
+
+class Account:
+    def __init__(self, address):
+        self.address = address
+
+
+def test_call_key_ignores_amounts():
+    assert call_key(TOK, 'transferFrom', (A, B, 50), Account(B)) == \
+        call_key(TOK, 'transferFrom', (A, B, 10 ** 18), Account(B))
+    assert call_key(TOK, 'transferFrom', (A, B, 50), Account(B)) != \
+        call_key(TOK, 'transferFrom', (B, A, 50), Account(B))
+    assert call_key(TOK, 'transfer', (Account(A), 50), B) == call_key(TOK, 'transfer', (A, 1), Account(B))
+
+
+def test_only_lists_that_save_gas_are_useful():
+    access_list = [{'address': TOK, 'storageKeys': ['0x' + '00' * 32]}]
+    assert Entry(access_list, 30000, 29800).useful
+    assert not Entry(access_list, 30000, 30100).useful
+    assert not Entry([], 30000, 30000).useful
+
+
+def test_normalize():
+    raw = [{'address': TOK, 'storageKeys': [b'\x01' * 32]}]
+    assert _normalize(raw) == [{'address': '0xaAaAaAaaAaAaAaaAaAAAAAAAAaaaAaAaAaaAaaAa', 'storageKeys': ['0x' + '01' * 32]}]
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = AccessListCache()
+    key = call_key(TOK, 'transfer', (A, 1), B)
+    cache.entries[key] = Entry([{'address': TOK, 'storageKeys': []}], 50000, 49000)
+    path = str(tmp_path / 'access_lists.json')
+    cache.save(path)
+    loaded = AccessListCache.load(path)
+    assert loaded.entries == cache.entries
+    assert len(AccessListCache.load(str(tmp_path / 'missing.json'))) == 0
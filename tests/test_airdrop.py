@@ -0,0 +1,84 @@
+import pytest
+import ape
+
+from scripts.airdrop import ProofFile, _slot_of, build, parse_address, read_csv, verify
+
+recipients = [('0x{:040x}'.format(i * 7919 + 1), i * 1000 + 1) for i in range(13)]
+
+
+@pytest.fixture
+def proof_file(tmp_path):
+    csv_path = tmp_path / 'airdrop.csv'
+    csv_path.write_text('address,amount\n' + ''.join('{},{}\n'.format(a, n) for a, n in recipients))
+    out_path = tmp_path / 'airdrop.bin'
+    root = build(read_csv(str(csv_path)), str(out_path), str(tmp_path))
+    proofs = ProofFile(str(out_path))
+    assert proofs.root == root
+    yield proofs
+    proofs.close()
+
+
+def test_lookup_and_verify(proof_file):
+    assert len(proof_file) == len(recipients)
+    assert proof_file.depth == 4
+    for expected_index, (address, amount) in enumerate(recipients):
+        index, found_amount, proof = proof_file.lookup(address)
+        assert (index, found_amount) == (expected_index, amount)
+        assert verify(proof_file.root, index, parse_address(address), amount, proof)
+        assert not verify(proof_file.root, index, parse_address(address), amount + 1, proof)
+        assert not verify(proof_file.root, index ^ 1, parse_address(address), amount, proof)
+
+
+def test_nodes_are_stored_once(proof_file):
+    # Header, 32 hash-table slots, 13 records and the levels of 13, 7, 4 and 2 nodes below the root.
+    assert proof_file.data.size() == 64 + 4 * 32 + 52 * 13 + 32 * (13 + 7 + 4 + 2)
+    assert [proof_file.record(i)[2] for i in range(13)] == [proof_file.lookup(a)[2] for a, _ in recipients]
+
+
+def test_shared_prefixes_spread_over_slots(tmp_path):
+    # Vanity addresses: the same first 16 bytes, different last 4.
+    accounts = [bytes.fromhex('00' * 16) + i.to_bytes(4, 'big') for i in range(2000)]
+    build([(account, 1) for account in accounts], str(tmp_path / 'vanity.bin'))
+    proofs = ProofFile(str(tmp_path / 'vanity.bin'))
+    slots = [_slot_of(account, proofs.slots) for account in accounts]
+    assert len(set(slots)) > len(accounts) // 2
+    assert [proofs.lookup(account)[0] for account in accounts[::100]] == list(range(0, 2000, 100))
+    proofs.close()
+
+
+def test_unknown_address(proof_file):
+    assert proof_file.lookup('0x' + 'ab' * 20) is None
+
+
+def test_single_leaf(tmp_path):
+    account = parse_address(recipients[0][0])
+    root = build([(account, 5)], str(tmp_path / 'one.bin'))
+    assert verify(root, 0, account, 5, [])
+
+
+def test_duplicate_address(tmp_path):
+    account = parse_address(recipients[0][0])
+    with pytest.raises(ValueError):
+        build([(account, 5), (account, 6)], str(tmp_path / 'dup.bin'))
+
+
+def test_claim(accounts, project, tmp_path):
+    owner, a1, a2 = accounts[0:3]
+    tok = project.RUToken.deploy(1, int(1e6), sender=owner)
+    tok.mint(sender=owner, value=300)
+
+    root = build([(parse_address(a1.address), 100), (parse_address(a2.address), 200)], str(tmp_path / 'claim.bin'))
+    proofs = ProofFile(str(tmp_path / 'claim.bin'))
+    airdrop = project.RUAirdrop.deploy(tok, root, sender=owner)
+    tok.transfer(airdrop, 300, sender=owner)
+
+    airdrop.claim(*proofs.claim_args(a2.address), sender=a1)
+    assert tok.balanceOf(a2) == 200
+    assert airdrop.isClaimed(1)
+    assert not airdrop.isClaimed(0)
+
+    with ape.reverts():
+        airdrop.claim(*proofs.claim_args(a2.address), sender=a2)
+    index, address, amount, proof = proofs.claim_args(a1.address)
+    with ape.reverts():
+        airdrop.claim(index, address, amount + 1, proof, sender=a1)
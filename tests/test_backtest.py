@@ -0,0 +1,73 @@
+import numpy as np
+from hypothesis import given, settings, Phase, strategies as st
+
+from scripts.amm import buy_quote, sell_quote, reserves_after_buy, reserves_after_sell
+from scripts.backtest import BUY, SELL, MINT, BURN, TRADE_DTYPE, Configs, backtest, format_report, synthetic_trades
+
+default_settings = {'max_examples': 50, 'deadline': None, 'derandomize': True, 'phases': (Phase.explicit, Phase.reuse, Phase.generate,)}
+
+
+def make_trades(*trades):
+    return np.array(list(trades), dtype=TRADE_DTYPE)
+
+
+def test_readme_sell_example():
+    # Selling 2 tokens to a pool of 10 tokens and 99 ETH with a 50% fee (see README).
+    assert sell_quote(2, 10, 99, 50) == (4, 5, 1)
+    report = backtest(make_trades((SELL, 2, 0)), Configs(50, 10, 99))
+    assert report['final_tok'][0] == 12
+    assert report['final_eth'][0] == 95
+    assert report['eth_fees'][0] == 5
+    assert report['tok_fees'][0] == 1
+
+
+@settings(**default_settings)
+@given(
+    feepercent=st.integers(min_value=0, max_value=95),
+    initial_eth=st.integers(min_value=10, max_value=300),
+    initial_tok=st.integers(min_value=2, max_value=100),
+    ops=st.lists(st.tuples(st.sampled_from([BUY, SELL]), st.integers(min_value=1, max_value=100)), max_size=10),
+)
+def test_backtest_matches_exact_model(feepercent, initial_eth, initial_tok, ops):
+    tok, eth = initial_tok, initial_eth
+    for kind, amount in ops:
+        if kind == BUY:
+            if amount >= tok:
+                continue
+            tok, eth = reserves_after_buy(amount, tok, eth, buy_quote(amount, tok, eth, feepercent))
+        else:
+            quote = sell_quote(amount, tok, eth, feepercent)
+            if quote[0] == 0:
+                continue
+            tok, eth = reserves_after_sell(amount, tok, eth, quote)
+
+    report = backtest(make_trades(*[(kind, amount, 0) for kind, amount in ops]),
+                      Configs(feepercent, initial_tok, initial_eth))
+    assert report['final_tok'][0] == tok
+    assert report['final_eth'][0] == eth
+
+
+def test_configurations_are_independent():
+    trades = synthetic_trades(200, seed=1, max_amount=50)
+    grid = Configs.grid(fees=[0, 3, 10], initial_tok=[1e4, 1e5], initial_eth=[1e4])
+    report = backtest(trades, grid)
+    for i in range(len(grid)):
+        single = backtest(trades, Configs(grid.fee_percent[i], grid.initial_tok[i], grid.initial_eth[i]))
+        for key in report:
+            assert report[key][i] == single[key][0]
+
+
+def test_limits_and_liquidity():
+    trades = make_trades((BUY, 10, 1), (MINT, 0.5, 0), (SELL, 10, 0), (BURN, 0.5, 0), (BURN, 1, 0))
+    report = backtest(trades, Configs(0, 100, 100))
+    # The buy exceeds its maxPrice and burning the whole supply is not allowed.
+    assert report['executed'][0] == 3
+    assert report['reverted'][0] == 2
+
+
+def test_report_ranked_by_lp_vs_hold():
+    report = {column: np.zeros(2) for column in ('fee_percent', 'initial_tok', 'initial_eth', 'fee_revenue_eth',
+                                                  'mean_slippage', 'executed', 'reverted')}
+    report.update(fee_percent=np.array([1.0, 2.0]), lp_return=np.array([0.5, 0.1]), lp_vs_hold=np.array([-0.1, 0.2]))
+    lines = format_report(report).split('\n')
+    assert [line.split('\t')[0] for line in lines[1:]] == ['2', '1']
@@ -0,0 +1,200 @@
+import asyncio
+
+import scripts.cosign
+from scripts.cosign import FAILED, PROPOSED, SIGNED, SIGNING, SUBMITTED, Coordinator, ProposalQueue
+from scripts.metrics import MetricsRegistry
+
+TOK = '0x' + 'a' * 40
+M1 = '0x' + '1' * 40
+M2 = '0x' + '2' * 40
+P = '0x' + '3' * 40
+C = '0x' + '4' * 40
+R = '0x' + '5' * 40
+
+
+def queue_at(tmp_path, registry=None):
+    return ProposalQueue(str(tmp_path / 'cosign.db'), registry or MetricsRegistry(enabled=False))
+
+
+def test_nonces_are_consecutive_per_multisig(tmp_path):
+    queue = queue_at(tmp_path)
+    ids = [queue.propose(TOK, M1, R, 10, P, C, 7) for _ in range(3)]
+    ids.append(queue.propose(TOK, M2, R, 10, P, C, 0))
+    assert [queue.get(i).nonce for i in ids] == [7, 8, 9, 0]
+    # The chain moved past the queued nonces (e.g., transfers sent outside the coordinator).
+    assert queue.get(queue.propose(TOK, M1, R, 10, P, C, 20)).nonce == 20
+
+
+def test_only_signed_prefixes_are_ready(tmp_path):
+    queue = queue_at(tmp_path)
+    for amount in (1, 2, 3):
+        queue.propose(TOK, M1, R, amount, P, C, 0)
+    batch = queue.claim(TOK, C, 3)
+    assert [p.status for p in batch] == [PROPOSED] * 3
+    assert queue.claim(TOK, C, 3) == []
+    queue.signed([(batch[1], (b'r', b's', 27)), (batch[2], (b'r', b's', 28))])
+    assert queue.ready(TOK, 10) == []
+    queue.signed([(batch[0], (b'r', b's', 27))])
+    assert [p.amount for p in queue.ready(TOK, 10)] == [1, 2, 3]
+    assert queue.ready(TOK, 10)[2].signature == (b'r', b's', 28)
+
+
+def test_failure_renumbers_later_transfers(tmp_path):
+    queue = queue_at(tmp_path)
+    for amount in (1, 2, 3):
+        queue.propose(TOK, M1, R, amount, P, C, 5)
+    first, second, third = queue.claim(TOK, C, 3)
+    queue.signed([(first, (b'r', b's', 27)), (second, (b'r', b's', 27))])
+    queue.failed(first, 'reverted', 5)
+    assert queue.get(first.id).status == FAILED
+    assert (queue.get(second.id).status, queue.get(second.id).nonce, queue.get(second.id).signature) == (PROPOSED, 5, None)
+    # `third` was being signed for nonce 7; that signature is stale now.
+    queue.signed([(third, (b'r', b's', 27))])
+    assert (queue.get(third.id).status, queue.get(third.id).nonce) == (PROPOSED, 6)
+    assert queue.get(queue.propose(TOK, M1, R, 4, P, C, 5)).nonce == 7
+
+
+def test_failure_renumbers_from_chain(tmp_path):
+    queue = queue_at(tmp_path)
+    for amount in (1, 2, 3):
+        queue.propose(TOK, M1, R, amount, P, C, 5)
+    first, second, third = queue.claim(TOK, C, 3)
+    queue.signed([(first, (b'r', b's', 27)), (second, (b'r', b's', 27))])
+    # The failed transfer was mined after all: the later ones keep their nonces and signatures.
+    queue.failed(first, 'timed out', 6)
+    assert 'nonce 5 was used' in queue.get(first.id).error
+    assert (queue.get(second.id).status, queue.get(second.id).nonce) == (SIGNED, 6)
+    queue.signed([(third, (b'r', b's', 27))])
+    assert (queue.get(third.id).status, queue.get(third.id).nonce) == (SIGNED, 7)
+    # Transfers sent outside the coordinator used nonces 6 to 8.
+    queue.failed(second, 'reverted', 9)
+    assert (queue.get(third.id).status, queue.get(third.id).nonce) == (PROPOSED, 9)
+
+
+def test_claims_are_exclusive(tmp_path):
+    queue = queue_at(tmp_path)
+    other = queue_at(tmp_path)  # Another process sharing the queue
+    for amount in range(10):
+        queue.propose(TOK, M1, R, amount, P, C, 0)
+    first = queue.claim(TOK, C, 6)
+    second = other.claim(TOK, C, 6)
+    assert len(first) == 6 and len(second) == 4
+    assert not {p.id for p in first} & {p.id for p in second}
+
+
+def test_queue_survives_restart(tmp_path):
+    registry = MetricsRegistry(enabled=True)
+    queue = queue_at(tmp_path, registry)
+    queue.propose(TOK, M1, R, 1, P, C, 0)
+    queue.propose(TOK, M1, R, 2, P, C, 0)
+    queue.claim(TOK, C, 1)
+    assert queue.depth()[SIGNING] == 1
+    queue.close()
+    queue = queue_at(tmp_path, registry)
+    queue.recover()
+    assert queue.depth() == {PROPOSED: 2, SIGNING: 0, SIGNED: 0, SUBMITTED: 0, FAILED: 0}
+    assert 'ru_cosign_queue_depth{status="proposed"} 2.0' in registry.render()
+
+
+class Receipt:
+    def __init__(self, txn_hash):
+        self.txn_hash = txn_hash
+
+
+class FakeToken:
+    address = TOK
+
+    def __init__(self):
+        self.nonces = {}
+        self.transfers = []
+
+    def transfer2of3(self, multisig, recipient, amount, nonce, sig, sender=None):
+        if nonce != self.nonces.get(multisig, 0) or sig != (b'r', nonce.to_bytes(1, 'big'), 27) or amount == 13:
+            raise ValueError('revert')
+        self.nonces[multisig] = nonce + 1
+        self.transfers.append((multisig, amount, sender))
+        if amount == 21:
+            raise TimeoutError('mined, but the receipt timed out')
+        return Receipt('0x{:064x}'.format(len(self.transfers)))
+
+
+class FakeCoordinator(Coordinator):
+    def next_nonce(self, multisig):
+        return self.tok.nonces.get(multisig, 0)
+
+    def sign(self, sk, proposal):
+        return (b'r', proposal.nonce.to_bytes(1, 'big'), 27)
+
+
+def test_coordinator_submits_in_nonce_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(scripts.cosign, 'key_address', lambda sk: C)
+    registry = MetricsRegistry(enabled=True)
+    queue = queue_at(tmp_path, registry)
+    tok = FakeToken()
+    for amount in (1, 2, 13, 4, 21, 6):
+        queue.propose(TOK, M1, R, amount, P, C, 0)
+    queue.propose(TOK, M2, R, 5, P, C, 0)
+    coordinator = FakeCoordinator(queue, tok, batch_size=2, poll_interval=0.01)
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(coordinator.run(['0xkey'], [type('Account', (), {'address': P})()], stop))
+        while queue.depth()[SUBMITTED] + queue.depth()[FAILED] < 7:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await task
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    # The transfer of 13 reverts, and the ones after it are signed again with lower nonces. The transfer of
+    # 21 is mined but reported as failed, and the one after it keeps its nonce.
+    assert [amount for m, amount, _ in tok.transfers if m == M1] == [1, 2, 4, 21, 6]
+    assert [amount for m, amount, _ in tok.transfers if m == M2] == [5]
+    assert tok.nonces == {M1: 5, M2: 1}
+    assert 'ru_cosign_latency_seconds_count{stage="submitted"} 5' in registry.render()
+
+
+class FlakyCoordinator(FakeCoordinator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = {'sign': 1, 'next_nonce': 1}
+        self.errors = []
+        self.on_error = lambda stage, err: self.errors.append(stage)
+
+    def fail_once(self, name):
+        if self.failures[name]:
+            self.failures[name] -= 1
+            raise ConnectionError('node unreachable')
+
+    def next_nonce(self, multisig):
+        self.fail_once('next_nonce')
+        return super().next_nonce(multisig)
+
+    def sign(self, sk, proposal):
+        self.fail_once('sign')
+        return super().sign(sk, proposal)
+
+
+def test_coordinator_survives_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(scripts.cosign, 'key_address', lambda sk: C)
+    registry = MetricsRegistry(enabled=True)
+    queue = queue_at(tmp_path, registry)
+    tok = FakeToken()
+    for amount in (1, 13, 3):
+        queue.propose(TOK, M1, R, amount, P, C, 0)
+    coordinator = FlakyCoordinator(queue, tok, batch_size=3, poll_interval=0.01)
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(coordinator.run(['0xkey'], [type('Account', (), {'address': P})()], stop))
+        while queue.depth()[SUBMITTED] + queue.depth()[FAILED] < 3:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await task
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    # The batch whose signing failed was released and signed again; the revert of 13 was retried once the
+    # nonce could be read.
+    assert coordinator.errors == ['sign', 'submit']
+    assert [amount for _, amount, _ in tok.transfers] == [1, 3]
+    assert queue.depth()[FAILED] == 1
+    assert 'ru_cosign_errors_total{stage="sign"} 1.0' in registry.render()
@@ -4,7 +4,7 @@ import pytest
 from ape import project, accounts as accts
 from hypothesis import given, settings, Phase, strategies as st
 from hypothesis.strategies import tuples, sampled_from
-from tests.test_tokens import deploy_ru_token, mint_ru_tokens, GenericTokenTest
+from tests.test_tokens import deploy_ru_token, mint_ru_tokens, GenericTokenTest, clone_deploy
 from scripts.exchange import grade_exchange
 
 from tests.utils import find_event
@@ -28,6 +28,9 @@ default_initial_eth = 200
 
 
 def deploy_ru_exchange(account) -> RUExchange:
+    if clone_deploy:
+        from scripts.factory import cached_factory, create_exchanges
+        return create_exchanges(cached_factory(account), 1, account)[0]
     exch = RUExchange.deploy(sender=account)
     return exch
 
@@ -118,6 +121,23 @@ class TestExchangeSpecifics:
     def test_buytokens(self, accounts, feepercent, initial_eth, tokdata):
         self.buytoken_testbody(accounts, feepercent, initial_eth, tokdata)
 
+    def test_price_accumulator_across_swap(self, accounts):
+        from ape import chain
+        from scripts.twap import Observation, extend, twap
+
+        exch = self.deploy_and_init_exchange(accounts[0])
+        chain.mine(deltatime=100)
+        tok_reserve, eth_reserve = exch.tokenBalance(), exch.balance
+        start = Observation(*exch.getPriceCumulative())
+
+        tx = exch.buyTokens(10, int(1e7), sender=accounts[1], value=int(1e7))
+        # The swap accumulates the price from before it, for the time since initialization.
+        end = Observation(*exch.getPriceCumulative())
+        assert end == extend(start.cumulative, start.timestamp, chain.blocks[tx.block_number].timestamp,
+                             tok_reserve, eth_reserve)
+        assert end.timestamp - start.timestamp >= 100
+        assert twap(start, end) == pytest.approx(eth_reserve / tok_reserve)
+
     def selltoken_testbody(self, accounts, feepercent, initial_eth, tokdata):
         self.feePercent = feepercent
         self.initial_eth = initial_eth
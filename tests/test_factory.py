@@ -0,0 +1,39 @@
+import ape
+
+from scripts.factory import create2_address, create_exchanges, create_tokens, deploy_factory, make_salts, predict_address
+
+
+def test_create2_address():
+    # Examples 0 and 5 of EIP-1014.
+    assert create2_address('0x0000000000000000000000000000000000000000', b'\x00' * 32, b'\x00') == \
+        '0x4D1A2e2bB4F88F0250f26Ffff098B0b30B26BF38'
+    assert create2_address('0x00000000000000000000000000000000deadbeef',
+                           bytes.fromhex('00000000000000000000000000000000000000000000000000000000cafebabe'),
+                           bytes.fromhex('deadbeef')) == '0x60f3f640a8508fC6a86d45DF051962668E1e8AC7'
+
+
+def test_clones(accounts):
+    owner, other = accounts[0:2]
+    factory = deploy_factory(owner)
+    salt = make_salts(1, 42)[0]
+    predicted = predict_address(factory.address, factory.tokenImplementation(), owner.address, salt)
+    assert factory.predictAddress(factory.tokenImplementation(), owner, salt) == predicted
+
+    factory.createToken(100, 1000, salt, sender=owner)
+    assert len(ape.chain.provider.get_code(predicted)) == 45
+    # The same salt gives another address for another sender, and can't be reused by the same one.
+    assert factory.predictAddress(factory.tokenImplementation(), other, salt) != predicted
+    with ape.reverts():
+        factory.createToken(100, 1000, salt, sender=owner)
+
+    tokens = create_tokens(factory, [(10, 20), (30, 40), (50, 60)], other, batch_size=2)
+    assert [(tok.tokenPrice(), tok.maxTokens()) for tok in tokens] == [(10, 20), (30, 40), (50, 60)]
+    with ape.reverts():
+        tokens[0].initializeClone(1, 1, sender=other)
+    with ape.reverts():
+        ape.project.RUToken.at(factory.tokenImplementation()).initializeClone(1, 1, sender=other)
+
+    exchanges = create_exchanges(factory, 2, other)
+    assert len({exch.address for exch in exchanges}) == 2
+    with ape.reverts():
+        exchanges[0].initializeClone(other, sender=other)
@@ -0,0 +1,42 @@
+from scripts.gas_profiler import SourceMapper, decode_sourcemap, instruction_indices, function_spans, step_costs
+
+
+def test_decode_sourcemap():
+    assert decode_sourcemap('1:2:0:-;:9;5:;;:::i;-1:-1:-1') == [
+        (1, 2, 0, '-'), (1, 9, 0, '-'), (5, 9, 0, '-'), (5, 9, 0, '-'), (5, 9, 0, 'i'), (-1, -1, -1, 'i')]
+
+
+def test_instruction_indices():
+    # PUSH1 0x80, PUSH2 0x0040, MSTORE, PUSH32 <32 bytes>, STOP
+    bytecode = bytes([0x60, 0x80, 0x61, 0x00, 0x40, 0x52, 0x7f] + [0] * 32 + [0x00])
+    assert instruction_indices(bytecode) == {0: 0, 2: 1, 5: 2, 6: 3, 39: 4}
+
+
+def test_function_spans():
+    source = 'interface I { function f() external; }\ncontract C {\n  function g(uint a) public { if (a) { } }\n  constructor() { }\n}'
+    names = [name for name, _, _ in function_spans(source)]
+    assert names == ['g', 'constructor']
+
+
+def test_step_costs_exclude_callee_gas():
+    struct_logs = [
+        {'depth': 1, 'gas': 1000, 'gasCost': 3, 'op': 'PUSH1'},
+        {'depth': 1, 'gas': 997, 'gasCost': 700, 'op': 'CALL'},
+        {'depth': 2, 'gas': 500, 'gasCost': 3, 'op': 'PUSH1'},
+        {'depth': 2, 'gas': 497, 'gasCost': 0, 'op': 'STOP'},
+        {'depth': 1, 'gas': 800, 'gasCost': 0, 'op': 'STOP'},
+    ]
+    assert step_costs(struct_logs) == [3, 194, 3, 0, 0]
+
+
+def test_locate_resolves_each_source():
+    own = 'contract C {\n  function f() public { }\n}'
+    imported = 'library L {\n\n  function g() internal { }\n}'
+    # PUSH1 0, PUSH1 0, ADD, ADD, STOP: in `f`, in the imported `g`, in a generated source, unmapped, out of range.
+    bytecode = bytes([0x60, 0, 0x60, 0, 0x01, 0x01, 0x00])
+    mapper = SourceMapper('C', bytecode, '30:5:1:-;18:3:0;0:10:2;-1:-1:-1', [('a_lib.sol', imported), ('c.sol', own)])
+    assert mapper.locate(0) == ('c.sol', 2, 'f')
+    assert mapper.locate(2) == ('a_lib.sol', 3, 'g')
+    assert mapper.locate(4) == (None, None, '<generated>')
+    assert mapper.locate(5) == (None, None, '<generated>')
+    assert mapper.locate(6) == (None, None, '<unknown>')
@@ -0,0 +1,135 @@
+import asyncio
+
+from hypothesis import given, settings, Phase, strategies as st
+
+from scripts.amm import buy_quote, sell_quote, reserves_after_buy, reserves_after_sell
+from scripts.keeper import BUY, SELL, Keeper, LimitOrder, OrderBook
+
+default_settings = {'max_examples': 50, 'deadline': None, 'derandomize': True, 'phases': (Phase.explicit, Phase.reuse, Phase.generate,)}
+
+
+def test_orders_match_in_price_priority():
+    book = OrderBook(fee_percent=0)
+    low = book.place(LimitOrder(BUY, 1, 10))
+    high = book.place(LimitOrder(BUY, 1, 20))
+    book.place(LimitOrder(BUY, 1, 5))
+    # 1000 tokens for 10000 ETH: a token costs a bit more than 10.
+    matched = book.match(1000, 10000)
+    assert [order.id for order in matched] == [high]
+    matched = book.match(1000, 9000)
+    assert [order.id for order in matched] == [low]
+    assert len(book) == 1
+
+
+def test_sells_match_lowest_limit_first():
+    book = OrderBook(fee_percent=0)
+    high = book.place(LimitOrder(SELL, 1, 9))
+    low = book.place(LimitOrder(SELL, 1, 5))
+    assert book.match(1000, 4000) == []
+    matched = book.match(1000, 10000)
+    assert [order.id for order in matched] == [low, high]
+
+
+def test_order_failing_exact_quote_rests():
+    book = OrderBook(fee_percent=0)
+    # Large enough to move the price: 100 tokens from a pool of 1000 cost 1112 ETH, not 1000.
+    big = book.place(LimitOrder(BUY, 100, 1000))
+    assert book.match(1000, 10000) == []
+    assert len(book) == 1
+    assert [order.id for order in book.match(1000, 8000)] == [big]
+
+
+def test_cancelled_orders_never_match():
+    book = OrderBook(fee_percent=0)
+    order_id = book.place(LimitOrder(BUY, 1, 100))
+    assert book.cancel(order_id).id == order_id
+    assert book.cancel(order_id) is None
+    assert book.match(1000, 1000) == []
+    assert book.buys == []
+
+
+class FakeKeeper(Keeper):
+    def __init__(self):
+        super().__init__(None, fee_percent=0)
+        self.head = 1
+        self.reads = []
+        self.log_ranges = []
+        self.submitted = []
+
+    def block_number(self):
+        return self.head
+
+    def read_reserves(self, block_number=None):
+        self.reads.append(block_number)
+        return (1000, 10000)
+
+    def exchange_logs(self, from_block, to_block):
+        self.log_ranges.append((from_block, to_block))
+        return False
+
+    def submit(self, order):
+        self.submitted.append(order.id)
+        raise ValueError('revert')
+
+
+def test_failed_order_rereads_reserves():
+    keeper = FakeKeeper()
+    failed = []
+    keeper.on_failed = lambda order, err: failed.append(order.id)
+    order_id = keeper.place(LimitOrder(BUY, 1, 20))
+
+    async def run():
+        await keeper.on_block(1)
+        await keeper.on_block(4)
+
+    asyncio.run(run())
+    # The reverted order rests again, and the next block reads the reserves rather than trusting the logs.
+    assert keeper.submitted == failed == [order_id, order_id]
+    assert keeper.reads == [1, 4]
+    assert keeper.log_ranges == []
+    assert len(keeper.book) == 1
+
+
+def test_run_stops_between_blocks():
+    keeper = FakeKeeper()
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(keeper.run(stop, poll_interval=60))
+        while keeper.last_block != 1:
+            await asyncio.sleep(0.01)
+        keeper.head = 3
+        stop.set()
+        await task
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert keeper.reads == [1]
+    keeper.reserves = (1000, 10000)
+    asyncio.run(keeper.on_block(5))
+    # Logs are checked for the blocks skipped since the last one processed.
+    assert keeper.log_ranges == [(2, 5)]
+
+
+@settings(**default_settings)
+@given(
+    feepercent=st.integers(min_value=0, max_value=50),
+    tok=st.integers(min_value=100, max_value=10 ** 6),
+    eth=st.integers(min_value=100, max_value=10 ** 9),
+    orders=st.lists(st.tuples(st.sampled_from([BUY, SELL]), st.integers(min_value=1, max_value=100),
+                              st.integers(min_value=0, max_value=10 ** 6)), max_size=20),
+)
+def test_matched_orders_execute_within_their_limits(feepercent, tok, eth, orders):
+    book = OrderBook(feepercent)
+    for side, amount, limit in orders:
+        book.place(LimitOrder(side, amount, limit))
+    matched = book.match(tok, eth)
+    assert len(matched) + len(book) == len(orders)
+    for order in matched:
+        if order.side == BUY:
+            quote = buy_quote(order.amount, tok, eth, feepercent)
+            assert quote[0] <= order.limit
+            tok, eth = reserves_after_buy(order.amount, tok, eth, quote)
+        else:
+            quote = sell_quote(order.amount, tok, eth, feepercent)
+            assert quote[0] >= order.limit
+            tok, eth = reserves_after_sell(order.amount, tok, eth, quote)
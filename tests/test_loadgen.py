@@ -0,0 +1,80 @@
+from scripts.loadgen import LoadGenerator, RpcError, parse_mix, percentiles
+
+TOK = '0x' + '1' * 40
+
+
+class FakeRpc:
+    def __init__(self):
+        self.sent = []
+        self.on_send = None
+        self.fail = False
+
+    def call(self, method, *params):
+        if method == 'eth_chainId':
+            return '0x539'
+        if method == 'eth_blockNumber':
+            return '0x10'
+        if method == 'eth_sendRawTransaction':
+            if self.fail:
+                raise RpcError('eth_sendRawTransaction: nonce too low')
+            self.sent.append(params[0])
+            if self.on_send:
+                self.on_send()
+            return '0x' + '0' * 64
+        raise AssertionError(method)
+
+
+def generator(rpc):
+    gen = LoadGenerator(rpc, None, senders=2, concurrency=1)
+    gen.results = {'transfer': {'latencies': [], 'reverts': 0, 'send_errors': 0, 'skipped': 0, 'gas': 0, 'issued': 1}}
+    gen.build = lambda operation: (gen.senders[0], TOK, '0x', 0, None)
+    return gen
+
+
+def test_parse_mix():
+    assert parse_mix('transfer=6, buyTokens=2.5,sellTokens') == {'transfer': 6, 'buyTokens': 2.5, 'sellTokens': 1}
+
+
+def test_percentiles():
+    assert percentiles([]) == {'p50': None, 'p90': None, 'p99': None, 'max': None}
+    assert percentiles([3.0]) == {'p50': 3.0, 'p90': 3.0, 'p99': 3.0, 'max': 3.0}
+    values = list(range(100, 0, -1))
+    assert percentiles(values) == {'p50': 51, 'p90': 91, 'p99': 100, 'max': 100}
+
+
+def test_pending_before_send():
+    rpc = FakeRpc()
+    gen = generator(rpc)
+    # With automining, the block including the transaction can be processed before the send returns.
+    rpc.on_send = lambda: seen.append(list(gen.pending.values()))
+    seen = []
+    gen.issue('transfer', 1.5)
+    assert seen == [[('transfer', 1.5, None)]]
+    assert gen.senders[0].nonce == 1
+
+    rpc.fail = True
+    gen.issue('transfer', 2.5)
+    assert len(gen.pending) == 1
+    assert gen.results['transfer']['send_errors'] == 1
+    assert gen.senders[0].nonce == 1
+
+
+def test_report():
+    gen = generator(FakeRpc())
+    gen.results['transfer'].update(latencies=[0.5, 1.5], reverts=1, gas=100_000, issued=3)
+    gen.results['buyTokens'] = {'latencies': [], 'reverts': 0, 'send_errors': 1, 'skipped': 0, 'gas': 0, 'issued': 1}
+    gen.pending['0x01'] = ('transfer', 10.0, None)
+    gen.blocks = [{'number': 1, 'gas_used': 5, 'transactions': 9, 'time': 9.0},
+                  {'number': 2, 'gas_used': 60_000, 'transactions': 1, 'time': 11.0},
+                  {'number': 3, 'gas_used': 40_000, 'transactions': 1, 'time': 12.0}]
+    report = gen.report(rate=2, duration=1, start=10.0, sent_end=11.0)
+    assert report['included'] == 2 and report['lost'] == 1 and report['blocks'] == 2
+    assert report['achieved_tps'] == 1.0
+    assert report['gas_per_block'] == {'mean': 50_000, 'max': 60_000}
+    assert report['txs_per_block'] == {'mean': 1, 'max': 1}
+    assert report['latency_s']['max'] == 1.5
+    assert report['operations']['transfer']['revert_rate'] == 0.5
+    assert report['operations']['transfer']['mean_gas'] == 50_000
+    assert report['operations']['buyTokens'] == {
+        'issued': 1, 'included': 0, 'skipped': 0, 'send_errors': 1, 'revert_rate': None, 'mean_gas': None,
+        'latency_s': {'p50': None, 'p90': None, 'p99': None, 'max': None}}
@@ -0,0 +1,83 @@
+import scripts.lp_tracker
+from scripts.lp_tracker import LPTracker, ZERO_ADDRESS
+
+A = '0x' + '1' * 40
+B = '0x' + '2' * 40
+
+
+def mint(to, shares, tok, eth):
+    return [('Transfer', {'from': ZERO_ADDRESS, 'to': to, 'value': shares}),
+            ('MintBurnDetails', {'numTOK': tok, 'numETH': eth})]
+
+
+def fee(eth, tok):
+    return [('FeeDetails', {'actualPayment': 0, 'actualEthFee': eth, 'actualTokenFee': tok})]
+
+
+def test_fees_are_shared_pro_rata():
+    tracker = LPTracker()
+    tracker.process_transaction(mint(A, 100, 1000, 2000))
+    tracker.process_transaction(fee(10, 4))
+    tracker.process_transaction(mint(B, 300, 3000, 6000))
+    tracker.process_transaction(fee(40, 8))
+
+    a, b = tracker.position(A), tracker.position(B)
+    assert (a['fees_eth'], a['fees_tok']) == (20, 6)
+    assert (b['fees_eth'], b['fees_tok']) == (30, 6)
+    assert a['share_of_pool'] == 0.25
+    assert (b['cost_tok'], b['cost_eth']) == (3000, 6000)
+
+
+def test_transfer_and_burn_move_cost_basis():
+    tracker = LPTracker()
+    tracker.process_transaction(mint(A, 100, 1000, 2000))
+    tracker.process_transaction([('Transfer', {'from': A, 'to': B, 'value': 25})])
+    tracker.process_transaction(fee(100, 0))
+    # MintBurnDetails may come before the Transfer.
+    tracker.process_transaction([('MintBurnDetails', {'numTOK': 500, 'numETH': 1050}),
+                                 ('Transfer', {'from': A, 'to': ZERO_ADDRESS, 'value': 50})])
+
+    a, b = tracker.position(A), tracker.position(B)
+    assert (a['shares'], a['cost_tok'], a['cost_eth']) == (25, 250, 500)
+    assert (a['withdrawn_tok'], a['withdrawn_eth']) == (500, 1050)
+    assert (b['shares'], b['cost_tok'], b['cost_eth']) == (25, 250, 500)
+    assert a['fees_eth'] == 75
+    assert b['fees_eth'] == 25
+    assert tracker.supply == 50
+
+
+class Log:
+    def __init__(self, txn_hash, log_index, event_name, **event_arguments):
+        self.transaction_hash = txn_hash
+        self.block_number = 1
+        self.log_index = log_index
+        self.event_name = event_name
+        self.event_arguments = event_arguments
+
+
+def test_initialize_deposit_is_cost_basis(monkeypatch):
+    deposits = {'0xinit': (1000, 2000)}
+    monkeypatch.setattr(scripts.lp_tracker, 'initialize_deposit', lambda exch, txn_hash: deposits.get(txn_hash))
+    tracker = LPTracker()
+    tracker.process_logs([
+        Log('0xinit', 0, 'Transfer', **{'from': ZERO_ADDRESS, 'to': A, 'value': 100}),
+        Log('0xmint', 1, 'Transfer', **{'from': ZERO_ADDRESS, 'to': B, 'value': 10}),
+        Log('0xmint', 2, 'MintBurnDetails', numTOK=100, numETH=200),
+    ], exch=object())
+    a, b = tracker.position(A), tracker.position(B)
+    assert (a['shares'], a['cost_tok'], a['cost_eth']) == (100, 1000, 2000)
+    assert (b['shares'], b['cost_tok'], b['cost_eth']) == (10, 100, 200)
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = str(tmp_path / 'lp.json')
+    tracker = LPTracker()
+    tracker.process_transaction(mint(A, 3, 10, 10))
+    tracker.process_transaction(fee(10 ** 30, 1))
+    tracker.cursor = (7, 2)
+    tracker.save(path)
+
+    restored = LPTracker.load(path)
+    assert restored.cursor == (7, 2)
+    assert restored.position(A) == tracker.position(A)
+    assert LPTracker.load(str(tmp_path / 'missing.json')).supply == 0
@@ -0,0 +1,170 @@
+import os
+
+import pytest
+from ape.api import AccountAPI
+from ape.exceptions import SignatureError
+
+from scripts.metrics import Counter, Gauge, Histogram, MetricsRegistry, _InstrumentedTransaction, instrument
+
+
+def test_counter_render():
+    counter = Counter('calls_total', 'Calls.', ('method',))
+    counter.inc('transfer')
+    counter.inc('transfer')
+    counter.inc('say "hi"')
+    assert list(counter.render()) == [
+        '# HELP calls_total Calls.',
+        '# TYPE calls_total counter',
+        'calls_total{method="say \\"hi\\""} 1.0',
+        'calls_total{method="transfer"} 2.0',
+    ]
+
+
+def test_gauge_keeps_last_value():
+    gauge = Gauge('queue_depth', 'Depth.', ('status',))
+    gauge.set(3, 'proposed')
+    gauge.set(1, 'proposed')
+    assert list(gauge.render())[1:] == ['# TYPE queue_depth gauge', 'queue_depth{status="proposed"} 1.0']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency.', ('method',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value, 'transfer')
+    assert list(histogram.render())[2:] == [
+        'latency_seconds_bucket{method="transfer",le="0.1"} 2',
+        'latency_seconds_bucket{method="transfer",le="1.0"} 3',
+        'latency_seconds_bucket{method="transfer",le="+Inf"} 4',
+        'latency_seconds_sum{method="transfer"} 2.65',
+        'latency_seconds_count{method="transfer"} 4',
+    ]
+
+
+def test_disabled_registry_does_not_wrap():
+    contract = object()
+    assert instrument(contract, MetricsRegistry(enabled=False)) is contract
+
+
+def test_write_textfile(tmp_path):
+    registry = MetricsRegistry(enabled=True)
+    registry.rpc_requests.inc('eth_call')
+    path = tmp_path / 'ru.prom'
+    registry.write_textfile(str(path))
+    assert 'ru_rpc_requests_total{rpc_method="eth_call"} 1.0' in path.read_text()
+    assert os.listdir(tmp_path) == ['ru.prom']
+
+
+class FailingSender:
+    call = AccountAPI.call
+
+    def prepare_transaction(self, txn):
+        raise ValueError('insufficient funds')
+
+    def sign_transaction(self, txn, **signer_options):
+        raise AssertionError('not reached')
+
+
+class Txn:
+    max_fee = 10
+    gas_limit = 21_000
+    value = 0
+    sender = None
+
+
+class Receipt:
+    gas_used = 21_000
+
+
+class Provider:
+    def __init__(self):
+        self.sent = []
+
+    def send_transaction(self, signed):
+        self.sent.append(('public', signed))
+        return Receipt()
+
+    def send_private_transaction(self, signed):
+        self.sent.append(('private', signed))
+        return Receipt()
+
+
+class Sender:
+    call = AccountAPI.call
+    address = '0x' + '1' * 40
+    balance = 10 ** 18
+
+    def __init__(self, signs=True):
+        self.signs = signs
+        self.signer_options = None
+
+    def prepare_transaction(self, txn):
+        return txn
+
+    def sign_transaction(self, txn, **signer_options):
+        self.signer_options = signer_options
+        return 'signed' if self.signs else None
+
+
+class ImpersonatedSender:
+    def call(self, txn, **kwargs):
+        raise AssertionError('sent through the handler')
+
+    def sign_transaction(self, txn, **signer_options):
+        raise AssertionError('not signed')
+
+
+class Handler:
+    def __init__(self):
+        self.provider = Provider()
+        self.kwargs = None
+        self.called = None
+
+    def as_transaction(self, *args, **kwargs):
+        self.kwargs = kwargs
+        return Txn()
+
+    def __call__(self, *args, **kwargs):
+        self.called = (args, kwargs)
+        return Receipt()
+
+
+def test_signing_recorded_only_when_signed():
+    registry = MetricsRegistry(enabled=True)
+    transaction = _InstrumentedTransaction(Handler(), 'RUToken', 'transfer', registry)
+    with pytest.raises(ValueError):
+        transaction(1, sender=FailingSender())
+    rendered = registry.render()
+    assert 'ru_contract_calls_total{contract="RUToken",method="transfer",kind="transaction"} 1.0' in rendered
+    assert 'ru_signing_seconds_count' not in rendered
+
+
+def test_declined_signature_raises():
+    registry = MetricsRegistry(enabled=True)
+    handler = Handler()
+    transaction = _InstrumentedTransaction(handler, 'RUToken', 'transfer', registry)
+    with pytest.raises(SignatureError):
+        transaction(1, sender=Sender(signs=False))
+    assert handler.provider.sent == []
+    assert 'ru_signing_seconds_count' not in registry.render()
+
+
+def test_call_options_passed_through():
+    registry = MetricsRegistry(enabled=True)
+    handler = Handler()
+    transaction = _InstrumentedTransaction(handler, 'RUToken', 'transfer', registry)
+    sender = Sender()
+    transaction(1, sender=sender, private=True, send_everything=True, passphrase='x')
+    assert handler.kwargs == {'sender': sender, 'private': True, 'send_everything': True, 'passphrase': 'x'}
+    assert sender.signer_options == {'sender': sender, 'passphrase': 'x'}
+    assert handler.provider.sent == [('private', 'signed')]
+    rendered = registry.render()
+    assert 'ru_signing_seconds_count{contract="RUToken",method="transfer"} 1' in rendered
+
+
+def test_overridden_call_not_mirrored():
+    registry = MetricsRegistry(enabled=True)
+    handler = Handler()
+    transaction = _InstrumentedTransaction(handler, 'RUToken', 'transfer', registry)
+    sender = ImpersonatedSender()
+    transaction(1, sender=sender)
+    assert handler.called == ((1,), {'sender': sender})
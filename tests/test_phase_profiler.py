@@ -0,0 +1,66 @@
+import csv
+import json
+
+import pytest
+
+import tests.phase_profiler
+
+SUITE = '''
+import time
+
+from hypothesis import given, settings, strategies as st
+from web3 import Web3, EthereumTesterProvider
+
+w3 = Web3(EthereumTesterProvider())
+
+
+def deploy_ru_token():
+    time.sleep(0.05)
+    return w3.eth.block_number
+
+
+def test_deploy():
+    time.sleep(0.02)
+    deploy_ru_token()
+
+
+@settings(max_examples=3, deadline=None, database=None)
+@given(st.integers())
+def test_examples(n):
+    time.sleep(0.01)
+'''
+
+
+def read_tsv(path):
+    with open(path) as f:
+        return list(csv.DictReader(f, delimiter='\t'))
+
+
+def test_phase_profile(pytester, monkeypatch):
+    # Attribute RPC requests to the functions of the suite under test.
+    monkeypatch.setattr(tests.phase_profiler, 'TESTS_DIR', str(pytester.path))
+    pytester.makepyfile(test_suite=SUITE)
+    result = pytester.runpytest('-p', 'no:ape_test', '-p', 'tests.phase_profiler', '--phase-profile=profile')
+    result.assert_outcomes(passed=2)
+    directory = pytester.path / 'profile'
+
+    phases = {row['test']: {k: float(v) for k, v in row.items() if k != 'test'}
+              for row in read_tsv(directory / 'phases.tsv')}
+    deploy = phases['test_suite.py::test_deploy']
+    # Each phase is charged only its own time: the sleeps, but not the request nested in `deploy`.
+    assert 0.02 <= deploy['call'] < 0.05 <= deploy['deploy']
+    assert deploy['rpc'] > 0
+    assert deploy['total'] == pytest.approx(sum(deploy[phase] for phase in tests.phase_profiler.PHASES), abs=1e-5)
+    examples = phases['test_suite.py::test_examples']
+    assert examples['call'] == 0 and examples['hypothesis'] > 0 and examples['example'] >= 0.03
+
+    callers = read_tsv(directory / 'rpc_callers.tsv')
+    assert {'test': 'test_suite.py::test_deploy', 'caller': 'deploy_ru_token'} in \
+        [{'test': row['test'], 'caller': row['caller']} for row in callers]
+
+    with open(directory / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    spans = {e['name']: e for e in events if e['cat'] == 'test_suite.py::test_deploy'}
+    assert spans['call']['ts'] <= spans['deploy']['ts'] <= spans['rpc']['ts']
+    assert spans['rpc']['ts'] + spans['rpc']['dur'] <= spans['call']['ts'] + spans['call']['dur']
+    assert spans['call']['dur'] / 1e6 >= deploy['call'] + deploy['deploy'] + deploy['rpc'] - 1e-6
@@ -0,0 +1,72 @@
+from ape import project
+from eth_utils import keccak
+from ethpm_types.abi import EventABI
+
+import scripts.receipt_events
+from scripts.receipt_events import EventIndex, ReceiptBatch, ReceiptEvents, events_for
+from tests.test_tokens import deploy_ru_token, mint_ru_tokens
+
+
+def test_matches_decoded_events(accounts):
+    a1, a2 = accounts[0:2]
+    tok = deploy_ru_token(project.RUToken, 10, int(1e6), a1)
+    mint_ru_tokens(tok, a1, 100)
+    txs = [tok.approve(a2, 50, sender=a1), tok.transfer(a2, 20, sender=a1)]
+
+    batch = ReceiptBatch(txs)
+    for tx, events in zip(txs, batch.receipts):
+        for expected in tx.events:
+            found = events.find(expected.event_name, address=tok.address)
+            assert found is not None
+            assert found.event_arguments == dict(expected.event_arguments)
+    assert [e.get('value') for e in batch.filter('Transfer')] == [20]
+    assert ReceiptEvents(txs[0]).find('FeeDetails') is None
+
+
+class FakeContractType:
+    def __init__(self, events):
+        self.events = events
+
+
+class FakeReceipt:
+    def __init__(self, logs, txn_hash=None, block_number=None):
+        self.logs = logs
+        self.txn_hash = txn_hash
+        self.block_number = block_number
+
+
+TRANSFER = EventABI(type='event', name='Transfer', anonymous=False, inputs=[
+    {'name': 'from', 'type': 'address', 'indexed': True},
+    {'name': 'to', 'type': 'address', 'indexed': True},
+    {'name': 'value', 'type': 'uint256', 'indexed': False}])
+
+
+def test_decodes_indexed_arguments():
+    index = EventIndex([FakeContractType([TRANSFER])])
+    src, dst = '0x' + '12' * 20, '0x' + 'ab' * 20
+    topics = [keccak(text='Transfer(address,address,uint256)'),
+              bytes(12) + bytes.fromhex(src[2:]), bytes(12) + bytes.fromhex(dst[2:])]
+    log = {'address': '0x' + '01' * 20, 'logIndex': 3, 'data': (77).to_bytes(32, 'big'),
+           # Providers give topics as bytes (HexBytes) or as hex strings.
+           'topics': [topics[0], '0x' + topics[1].hex(), topics[2]]}
+
+    event = ReceiptEvents(FakeReceipt([log], '0x' + 'ee' * 32, 9), index).find('Transfer')
+    assert event.log_index == 3
+    assert (event.transaction_hash, event.block_number) == ('0x' + 'ee' * 32, 9)
+    assert event['from'] == '0x1212121212121212121212121212121212121212'
+    assert event.to == '0xABaBaBaBABabABabAbAbABAbABabababaBaBABaB'
+    assert event.value == 77
+
+
+def test_events_for_reuses_recent_receipts(monkeypatch):
+    monkeypatch.setattr(scripts.receipt_events, 'project_event_index', lambda: EventIndex([FakeContractType([TRANSFER])]))
+    monkeypatch.setattr(scripts.receipt_events, 'RECENT_RECEIPTS', 2)
+    monkeypatch.setattr(scripts.receipt_events, '_recent', type(scripts.receipt_events._recent)())
+    first, second, third = (FakeReceipt([], '0x{:064x}'.format(i), 1) for i in range(3))
+    events = events_for(first)
+    assert events_for(first) is events
+    # The same transaction included again in another block (after a revert) is indexed again.
+    assert events_for(FakeReceipt([], first.txn_hash, 2)) is not events
+    events_for(second)
+    events_for(third)
+    assert events_for(first) is not events
@@ -1,3 +1,4 @@
+import os
 import pytest
 
 import ape
@@ -216,7 +217,15 @@ def default_setup(request, project, chain):
     request.cls.RUToken = project.RUToken
 
 
+# With RU_CLONE_DEPLOY=1, tokens are created as minimal proxies by a factory (see scripts/factory.py),
+# which is much cheaper than deploying the whole contract for every test or Hypothesis example.
+clone_deploy = os.environ.get('RU_CLONE_DEPLOY') == '1'
+
+
 def deploy_ru_token(contract, price, maxtok, account):
+    if clone_deploy and contract.contract_type.name == 'RUToken':
+        from scripts.factory import cached_factory, create_tokens
+        return create_tokens(cached_factory(account), [(price, maxtok)], account)[0]
     return contract.deploy(price, maxtok, sender=account)
 
 
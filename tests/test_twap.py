@@ -0,0 +1,23 @@
+from scripts.twap import CUMULATIVE_MOD, TIMESTAMP_MOD, Observation, extend, twap
+
+
+def test_twap_over_reserve_changes():
+    # Price 2 ETH/token for 10s, then 4 ETH/token for 30s.
+    start = extend(0, 1000, 1000, 100, 200)
+    middle = extend(start.cumulative, start.timestamp, 1010, 100, 200)
+    end = extend(middle.cumulative, middle.timestamp, 1040, 50, 200)
+    assert twap(start, middle) == 2
+    assert twap(middle, end) == 4
+    assert twap(start, end) == 3.5
+
+
+def test_twap_wraps_around():
+    start = Observation(CUMULATIVE_MOD - 2 ** 112, TIMESTAMP_MOD - 5)
+    end = extend(start.cumulative, start.timestamp, TIMESTAMP_MOD + 5, 1, 3)
+    assert end.timestamp == 5
+    assert end.cumulative < start.cumulative
+    assert twap(start, end) == 3
+
+
+def test_uninitialized_pool_does_not_accumulate():
+    assert extend(0, 0, 100, 0, 0) == Observation(0, 100)
@@ -1,9 +1,15 @@
 
 from ape_ethereum import Receipt
 
+from scripts.receipt_events import events_for, project_event_index
+
+
 def find_event(tx: Receipt, name: str):
+    # Only the logs of the requested event are decoded, once per receipt (see scripts/receipt_events.py).
+    # Project events are returned as `DecodedEvent`s, with the attributes of ape's `ContractLog`.
+    if project_event_index().topics(name):
+        return events_for(tx).find(name)
     for event in tx.events:
         if event.event_name == name:
             return event
     return None
-